@@ -12,6 +12,7 @@ from PyQt5.QtQuick import QQuickWindow, QQuickItem
 from nk3.configuration.storage import Storage
 from nk3.depthFirstIterator import DepthFirstIterator
 from nk3.document.node import DocumentNode
+from nk3.fileReader.fileLoadThread import FileLoadThread
 from nk3.fileReader.fileReader import FileReader
 from nk3.machine.machine import Machine
 from nk3.machine.outputmethod import OutputMethod
@@ -103,6 +104,8 @@ class Application(QObjectBase):
     active_machine = QProperty[Machine](Machine())
     result_info = QProperty[str]("No file loaded")
     highlight_node = QProperty[Optional[DocumentNode]](None)
+    loading = QProperty[bool](False)
+    load_progress = QProperty[float](0.0)
 
     @classmethod
     def getInstance(cls, *args: Any) -> "Application":
@@ -142,6 +145,9 @@ class Application(QObjectBase):
         self.highlight_nodeChanged.connect(self.__onHighlightChanged)
 
         self.__last_file = ""
+        self.__load_thread = None  # type: Optional[FileLoadThread]
+        # Cancelled threads are kept until they are finished, a QThread object cannot be deleted while running.
+        self.__running_load_threads = []  # type: List[FileLoadThread]
 
         s = Storage()
         if s.load():
@@ -221,20 +227,50 @@ class Application(QObjectBase):
     def loadFile(self, filename: QUrl) -> None:
         self._loadFile(filename.toLocalFile())
 
+    @qtSlot
+    def cancelLoad(self) -> None:
+        if self.__load_thread is not None:
+            self.__load_thread.cancel()
+
     @qtSlot
     def home(self) -> None:
         self.__view.home()
 
+    # Files are loaded on a separate thread. Loading a new file cancels the file that is still loading.
+    # The current documents are only replaced once the new document is completely loaded.
     def _loadFile(self, filename: str) -> None:
         logging.info("Going to load: %s", filename)
         reader = FileReader.getFileTypes()[os.path.splitext(filename)[1][1:].lower()]
-        document_node = reader().load(filename)
+        self.cancelLoad()
+        thread = FileLoadThread(reader(), filename)
+        thread.onProgress.connect(lambda progress: self.__onLoadProgress(thread, progress))
+        thread.onLoaded.connect(lambda document_node: self.__onLoaded(thread, document_node))
+        thread.finished.connect(lambda: self.__onLoadThreadFinished(thread))
+        self.__load_thread = thread
+        self.__running_load_threads.append(thread)
+        self.load_progress = 0.0
+        self.loading = True
+        thread.start()
+
+    def __onLoadProgress(self, thread: FileLoadThread, progress: float) -> None:
+        if thread is self.__load_thread:
+            self.load_progress = progress
+
+    def __onLoaded(self, thread: FileLoadThread, document_node: DocumentNode) -> None:
+        if thread is not self.__load_thread:
+            return
         while len(self.__document_list) > 0:
             self.__document_list.remove(0)
         self.__document_list.append(document_node)
-        self.__last_file = filename
+        self.__last_file = thread.filename
         self.repaint()
 
+    def __onLoadThreadFinished(self, thread: FileLoadThread) -> None:
+        self.__running_load_threads.remove(thread)
+        if thread is self.__load_thread:
+            self.__load_thread = None
+            self.loading = False
+
     @qtSlot
     def getLoadFileTypes(self) -> List[str]:
         types = FileReader.getFileTypes()
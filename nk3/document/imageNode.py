@@ -1,17 +1,57 @@
 import numpy
-from typing import Optional, Tuple
-from PyQt5.QtGui import QImage, QOpenGLTexture
+import numpy.typing
+from typing import Optional, Tuple, Callable
+from PyQt5.QtGui import QImage, QOpenGLTexture, QColor
 from .node import DocumentNode
 
 
 class DocumentImageNode(DocumentNode):
-    def __init__(self, name: str, filename: str) -> None:
+    # An image is loaded from the file, unless a heightmap_source is given, which creates the heightmap when it is first needed.
+    # Such a heightmap of width by height pixels is shown as a plain gray area, as it is not created for display.
+    # Each pixel covers pixel_size by pixel_size in document coordinates, and pixel [0, 0] starts at the origin.
+    def __init__(self, name: str, filename: str, *,
+                 heightmap_source: Optional[Callable[[], numpy.typing.NDArray[numpy.float32]]] = None, width: int = 0, height: int = 0,
+                 pixel_size: float = 1.0, origin: complex = complex()) -> None:
         super().__init__(name)
-        self.__offset = complex()
+        self.__offset = origin
+        self.__pixel_size = pixel_size
+        self.__heightmap_source = heightmap_source
 
         self.qimage = QImage()
-        self.qimage.load(filename)
+        if heightmap_source is None:
+            self.qimage.load(filename)
+            self.__size = complex(self.qimage.width(), self.qimage.height())
+        else:
+            self.qimage = QImage(1, 1, QImage.Format_Grayscale8)
+            self.qimage.fill(QColor(128, 128, 128))
+            self.__size = complex(width, height)
         self.opengl_texture: Optional[QOpenGLTexture] = None
+        self.__heightmap: Optional[numpy.typing.NDArray[numpy.float32]] = None
+
+    # Height of each pixel in the range 0.0 (black) to 1.0 (white), based on the HSV value of the pixel.
+    # Row 0 is the bottom row of the image, so the array is indexed as [y, x] in document coordinates.
+    def getHeightmap(self) -> numpy.typing.NDArray[numpy.float32]:
+        if self.__heightmap is None and self.__heightmap_source is not None:
+            self.__heightmap = self.__heightmap_source()
+            self.__heightmap_source = None
+        if self.__heightmap is None:
+            image = self.qimage.convertToFormat(QImage.Format_RGB32)
+            bits = image.constBits()
+            assert bits is not None
+            rows = numpy.frombuffer(bits.asstring(image.sizeInBytes()), dtype=numpy.uint8).reshape(image.height(), image.bytesPerLine())
+            pixels = rows[:, :image.width() * 4].reshape(image.height(), image.width(), 4)
+            value = numpy.max(pixels[:, :, :3], axis=2)
+            self.__heightmap = numpy.flipud(value).astype(numpy.float32) / numpy.float32(255.0)
+        return self.__heightmap
+
+    @property
+    def pixel_size(self) -> float:
+        return self.__pixel_size
+
+    # Document position of the bottom left corner of the image.
+    @property
+    def origin(self) -> complex:
+        return self.__offset
 
     def offset(self, offset: complex) -> None:
         self.__offset += offset
@@ -20,4 +60,4 @@ class DocumentImageNode(DocumentNode):
         pass
 
     def _getAABB(self) -> Optional[Tuple[complex, complex]]:
-        return complex(0, 0), complex(self.qimage.size().width(), self.qimage.size().height())
+        return self.__offset, self.__offset + self.__size * self.__pixel_size
@@ -0,0 +1,47 @@
+import logging
+
+from PyQt5.QtCore import pyqtSignal, QThread
+
+from nk3.fileReader.fileReader import FileReader
+from nk3.processor.cancelToken import ProcessingCancelled
+
+
+# Thread that loads a single file, so the user interface keeps running while large files are loaded.
+# The loaded document is moved to the thread that created this thread before it is handed over with onLoaded.
+class FileLoadThread(QThread):
+    onProgress = pyqtSignal(float)
+    onLoaded = pyqtSignal(object)
+
+    def __init__(self, reader: FileReader, filename: str) -> None:
+        super().__init__()
+        self.__reader = reader
+        self.__filename = filename
+        self.__target_thread = QThread.currentThread()
+        self.__reported_percentage = -1
+        self.__reader.onProgress = self.__onProgress
+
+    @property
+    def filename(self) -> str:
+        return self.__filename
+
+    def cancel(self) -> None:
+        self.__reader.cancel()
+
+    def run(self) -> None:
+        try:
+            document_node = self.__reader.load(self.__filename)
+        except ProcessingCancelled:
+            logging.info("Loading cancelled: %s", self.__filename)
+            return
+        except:
+            logging.exception("Exception while loading: %s", self.__filename)
+            return
+        document_node.moveToThread(self.__target_thread)
+        self.onLoaded.emit(document_node)
+
+    # Only pass on whole percentages, so the user interface is not flooded with updates.
+    def __onProgress(self, progress: float) -> None:
+        percentage = int(progress * 100)
+        if percentage != self.__reported_percentage:
+            self.__reported_percentage = percentage
+            self.onProgress.emit(progress)
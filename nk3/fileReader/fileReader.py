@@ -4,11 +4,22 @@ from nk3.depthFirstIterator import DepthFirstIterator
 from nk3.document.node import DocumentNode
 from nk3.document.vectorNode import DocumentVectorNode
 from nk3.pluginRegistry import PluginRegistry
+from nk3.processor.cancelToken import CancelToken
 
 
 class FileReader:
     def __init__(self) -> None:
-        pass
+        # Called with the loaded fraction of the file, from the thread that is loading.
+        self.onProgress = lambda progress: None
+        self.__cancel_token = CancelToken()
+
+    # Can be called from any thread, load() then raises ProcessingCancelled at its next progress report.
+    def cancel(self) -> None:
+        self.__cancel_token.cancel()
+
+    def _reportProgress(self, progress: float) -> None:
+        self.__cancel_token.check()
+        self.onProgress(progress)
 
     def load(self, filename: str) -> DocumentNode:
         raise NotImplementedError
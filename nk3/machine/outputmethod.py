@@ -5,7 +5,7 @@ from typing import List, Dict, Optional, Iterator
 from PyQt5.QtCore import pyqtProperty, QPoint
 
 import nk3.application
-from nk3.processor.result import Move
+from nk3.processor.result import Move, MoveArray
 from nk3.qt.QObjectBase import QProperty, qtSlot
 from nk3.qt.QObjectList import QObjectList
 from nk3.settingInstance import SettingInstance
@@ -35,6 +35,11 @@ class OutputMethod(QObjectList[SettingInstance]):
     def getMoves() -> Iterator[Move]:
         return nk3.application.Application.getInstance().result_data.moves
 
+    # Zero-copy view on the moves of the current result, see Result.moveArray
+    @staticmethod
+    def getMoveArray() -> MoveArray:
+        return nk3.application.Application.getInstance().result_data.moveArray
+
     # Set the qml source to a file inside the plugin that provides this output method type.
     def setLocalQmlSource(self, filename: str) -> None:
         module_filename = sys.modules[type(self).__module__].__file__
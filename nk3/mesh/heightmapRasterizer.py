@@ -0,0 +1,121 @@
+import math
+from typing import Callable, Tuple, List
+
+import numpy
+import numpy.typing
+
+TriangleArray = numpy.typing.NDArray[numpy.float32]
+Heightmap = numpy.typing.NDArray[numpy.float32]
+
+# Triangles are handled in batches, each batch needs at most this much memory for its temporaries.
+# The triangles of a batch are split in spans of pixels on each row they cover, and those spans into pixels.
+_BATCH_BYTES = 64 * 1024 * 1024
+_BYTES_PER_SPAN = 400
+_BYTES_PER_PIXEL = 80
+
+
+# Position of the corner of pixel [0, 0] in document coordinates, and the width and height in pixels, of the heightmap of a mesh.
+def heightmapBounds(triangles: TriangleArray, pixel_size: float) -> Tuple[complex, int, int]:
+    if len(triangles) < 1:
+        return complex(0, 0), 0, 0
+    minimum = triangles[:, :, :2].min(axis=(0, 1)).astype(numpy.float64)
+    maximum = triangles[:, :, :2].max(axis=(0, 1)).astype(numpy.float64)
+    width = max(1, math.ceil((maximum[0] - minimum[0]) / pixel_size))
+    height = max(1, math.ceil((maximum[1] - minimum[1]) / pixel_size))
+    return complex(minimum[0], minimum[1]), width, height
+
+
+# Render the mesh from above into a z-buffer, with a pixel for every pixel_size in x and y, placed at heightmapBounds().
+# Heights are scaled to the range of the model, 0.0 is the bottom and 1.0 the top, pixels without triangles are 0.0.
+# Row 0 is the bottom row, so like DocumentImageNode.getHeightmap() the array is indexed as [y, x].
+def rasterizeHeightmap(triangles: TriangleArray, pixel_size: float, *,
+                       progress_callback: Callable[[float], None] = lambda progress: None) -> Heightmap:
+    origin, width, height = heightmapBounds(triangles, pixel_size)
+    heightmap = numpy.zeros((height, width), dtype=numpy.float32)
+    if len(triangles) < 1:
+        return heightmap
+    z_bottom = float(triangles[:, :, 2].min())
+    z_range = float(triangles[:, :, 2].max()) - z_bottom
+    # An upper bound of the amount of rows each triangle covers.
+    row_counts = (triangles[:, :, 1].max(axis=1) - triangles[:, :, 1].min(axis=1)) / pixel_size + 2.0
+    for batch_start, batch_end in _batches(row_counts, _BATCH_BYTES // _BYTES_PER_SPAN):
+        progress_callback(batch_start / len(triangles))
+        # Work in pixel coordinates, where pixel [y, x] has its center at (x + 0.5, y + 0.5).
+        vertices = triangles[batch_start:batch_end].astype(numpy.float64)
+        vertices[:, :, 0] = (vertices[:, :, 0] - origin.real) / pixel_size
+        vertices[:, :, 1] = (vertices[:, :, 1] - origin.imag) / pixel_size
+        vertices[:, :, 2] = (vertices[:, :, 2] - z_bottom) / z_range if z_range > 0.0 else 1.0
+        _rasterizeTriangles(heightmap, vertices)
+    return heightmap
+
+
+# Split each triangle in the spans of pixels it covers on each pixel row, and keep the highest point of each pixel.
+def _rasterizeTriangles(heightmap: Heightmap, vertices: numpy.typing.NDArray[numpy.float64]) -> None:
+    height, width = heightmap.shape
+    # The plane of each triangle as z = z0 + dz_dx * x + dz_dy * y, vertical triangles are not visible from above.
+    edge1 = vertices[:, 1] - vertices[:, 0]
+    edge2 = vertices[:, 2] - vertices[:, 0]
+    normal_x = edge1[:, 1] * edge2[:, 2] - edge1[:, 2] * edge2[:, 1]
+    normal_y = edge1[:, 2] * edge2[:, 0] - edge1[:, 0] * edge2[:, 2]
+    normal_z = edge1[:, 0] * edge2[:, 1] - edge1[:, 1] * edge2[:, 0]
+    visible = normal_z != 0.0
+    vertices = vertices[visible]
+    dz_dx = -normal_x[visible] / normal_z[visible]
+    dz_dy = -normal_y[visible] / normal_z[visible]
+    z0 = vertices[:, 0, 2] - dz_dx * vertices[:, 0, 0] - dz_dy * vertices[:, 0, 1]
+
+    # The rows with their pixel center within the triangle.
+    first_row = numpy.maximum(numpy.ceil(vertices[:, :, 1].min(axis=1) - 0.5), 0).astype(numpy.int64)
+    end_row = numpy.minimum(numpy.floor(vertices[:, :, 1].max(axis=1) - 0.5) + 1, height).astype(numpy.int64)
+    row_counts = numpy.maximum(end_row - first_row, 0)
+    span_triangle = numpy.repeat(numpy.arange(len(vertices)), row_counts)
+    span_row = first_row[span_triangle] + numpy.arange(len(span_triangle)) - numpy.repeat(numpy.cumsum(row_counts) - row_counts, row_counts)
+    y = span_row + 0.5
+
+    # Where the row crosses the edges of the triangle, edges that the row does not cross give no limit.
+    left = numpy.full(len(span_triangle), numpy.inf)
+    right = numpy.full(len(span_triangle), -numpy.inf)
+    for edge in range(3):
+        start = vertices[span_triangle, edge]
+        end = vertices[span_triangle, (edge + 1) % 3]
+        crosses = (numpy.minimum(start[:, 1], end[:, 1]) <= y) & (numpy.maximum(start[:, 1], end[:, 1]) >= y) & (start[:, 1] != end[:, 1])
+        with numpy.errstate(divide="ignore", invalid="ignore"):
+            x = start[:, 0] + (y - start[:, 1]) * (end[:, 0] - start[:, 0]) / (end[:, 1] - start[:, 1])
+        left = numpy.where(crosses, numpy.minimum(left, x), left)
+        right = numpy.where(crosses, numpy.maximum(right, x), right)
+    valid = left <= right
+    first_column = numpy.maximum(numpy.ceil(left[valid] - 0.5), 0).astype(numpy.int64)
+    end_column = numpy.minimum(numpy.floor(right[valid] - 0.5) + 1, width).astype(numpy.int64)
+    span_triangle = span_triangle[valid]
+    span_row = span_row[valid]
+    pixel_counts = numpy.maximum(end_column - first_column, 0)
+
+    # Only the start, height and slope of each span are needed to fill its pixels.
+    span_start = span_row * width + first_column
+    span_z = z0[span_triangle] + dz_dx[span_triangle] * (first_column + 0.5) + dz_dy[span_triangle] * (span_row + 0.5)
+    span_slope = dz_dx[span_triangle]
+    _fillSpans(heightmap.reshape(-1), span_start, span_z, span_slope, pixel_counts)
+
+
+# Fill the spans in batches, so the per pixel temporaries stay within _BATCH_BYTES.
+def _fillSpans(pixels: Heightmap, span_start: numpy.typing.NDArray[numpy.int64], span_z: numpy.typing.NDArray[numpy.float64],
+               span_slope: numpy.typing.NDArray[numpy.float64], pixel_counts: numpy.typing.NDArray[numpy.int64]) -> None:
+    for batch_start, batch_end in _batches(pixel_counts, _BATCH_BYTES // _BYTES_PER_PIXEL):
+        counts = pixel_counts[batch_start:batch_end]
+        span = numpy.repeat(numpy.arange(batch_start, batch_end), counts)
+        local = numpy.arange(len(span)) - numpy.repeat(numpy.cumsum(counts) - counts, counts)
+        z = numpy.clip(span_z[span] + span_slope[span] * local, 0.0, 1.0).astype(numpy.float32)
+        numpy.maximum.at(pixels, span_start[span] + local, z)
+
+
+# Split the items in consecutive batches with a total size up to the limit, an item larger than the limit gets its own batch.
+def _batches(sizes: numpy.typing.NDArray[numpy.generic], limit: int) -> List[Tuple[int, int]]:
+    cumulative = numpy.cumsum(sizes)
+    result = []  # type: List[Tuple[int, int]]
+    batch_start = 0
+    while batch_start < len(sizes):
+        done = float(cumulative[batch_start - 1]) if batch_start > 0 else 0.0
+        batch_end = max(batch_start + 1, int(numpy.searchsorted(cumulative, done + limit, side="right")))
+        result.append((batch_start, batch_end))
+        batch_start = batch_end
+    return result
@@ -0,0 +1,115 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, Future
+from typing import List, Tuple, Dict, Callable, Optional, Sequence
+
+import numpy
+import numpy.typing
+
+TriangleArray = numpy.typing.NDArray[numpy.float32]
+PointArray = numpy.typing.NDArray[numpy.complex128]
+# The contours at a single level, each with its points and if it is closed.
+Contours = List[Tuple[PointArray, bool]]
+
+# Below this amount of triangles starting worker processes takes longer than slicing on the current thread.
+_PARALLEL_MINIMUM_TRIANGLES = 100000
+# Levels are divided in more chunks than workers, so progress is reported and workers that finish early get more work.
+_CHUNKS_PER_WORKER = 4
+
+
+# Intersect a mesh with horizontal planes at the given levels.
+# A vertex exactly on a plane counts as below it, so the contours are those of the material just above each level.
+# Triangles are expected counterclockwise seen from outside, then closed contours are counterclockwise around material.
+# process_pool_size: Amount of worker processes, defaults to the amount of CPUs, 1 or less slices on the current thread.
+def sliceMesh(triangles: TriangleArray, levels: Sequence[float], *, process_pool_size: Optional[int] = None,
+              progress_callback: Callable[[float], None] = lambda progress: None) -> List[Contours]:
+    if process_pool_size is None:
+        process_pool_size = os.cpu_count() or 1
+    if process_pool_size <= 1 or len(triangles) < _PARALLEL_MINIMUM_TRIANGLES or len(levels) < 2:
+        result = []  # type: List[Contours]
+        for index, level in enumerate(levels):
+            progress_callback(index / len(levels))
+            result.append(_sliceLevel(triangles, level))
+        return result
+
+    z_min = triangles[:, :, 2].min(axis=1)
+    z_max = triangles[:, :, 2].max(axis=1)
+    chunks = [chunk.tolist() for chunk in numpy.array_split(numpy.array(levels, dtype=numpy.float64), process_pool_size * _CHUNKS_PER_WORKER) if len(chunk) > 0]
+    # Use spawn instead of fork, forking a process with Qt and its threads running is not safe.
+    pool = ProcessPoolExecutor(process_pool_size, mp_context=multiprocessing.get_context("spawn"))
+    try:
+        futures = []  # type: List[Future[List[Contours]]]
+        for chunk in chunks:
+            # Only send the triangles that can cross one of the levels in this chunk.
+            mask = (z_max > min(chunk)) & (z_min <= max(chunk))
+            futures.append(pool.submit(_sliceLevels, triangles[mask], chunk))
+        result = []
+        for index, future in enumerate(futures):
+            progress_callback(index / len(futures))
+            result += future.result()
+        return result
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _sliceLevels(triangles: TriangleArray, levels: List[float]) -> List[Contours]:
+    return [_sliceLevel(triangles, level) for level in levels]
+
+
+def _sliceLevel(triangles: TriangleArray, level: float) -> Contours:
+    z = triangles[:, :, 2]
+    crossing = (z.max(axis=1) > level) & (z.min(axis=1) <= level)
+    crossing_triangles = triangles[crossing].astype(numpy.float64)
+    above = crossing_triangles[:, :, 2] > level
+    rows = numpy.arange(len(crossing_triangles))
+
+    # Going around the triangle, one edge goes down through the level and one edge goes up through it.
+    # The contour segment runs from the down edge to the up edge, which keeps the material on its left.
+    points = numpy.empty((len(crossing_triangles), 3), dtype=numpy.complex128)
+    above_next = numpy.roll(above, -1, axis=1)
+    down = above & ~above_next
+    up = ~above & above_next
+    for edge in range(3):
+        v0 = crossing_triangles[:, edge]
+        v1 = crossing_triangles[:, (edge + 1) % 3]
+        # Always interpolate from the lower to the upper vertex, so both triangles sharing an edge get the exact same point.
+        lower = numpy.where(above[:, edge, None], v1, v0)
+        upper = numpy.where(above[:, edge, None], v0, v1)
+        # Edges that do not cross the level give invalid points, those are never selected.
+        with numpy.errstate(divide="ignore", invalid="ignore"):
+            t = (level - lower[:, 2]) / (upper[:, 2] - lower[:, 2])
+            points[:, edge] = (lower[:, 0] + (upper[:, 0] - lower[:, 0]) * t) + 1j * (lower[:, 1] + (upper[:, 1] - lower[:, 1]) * t)
+    starts = points[rows, numpy.argmax(down, axis=1)]
+    ends = points[rows, numpy.argmax(up, axis=1)]
+    # A vertex on the level with both other vertices above gives a segment of zero length.
+    keep = starts != ends
+    return _chainSegments(starts[keep].tolist(), ends[keep].tolist())
+
+
+# Chain segments into contours, by looking up the segment that starts where the previous one ends.
+# Chains that do not close, on meshes with holes, are returned as open contours.
+def _chainSegments(starts: List[complex], ends: List[complex]) -> Contours:
+    segments_by_start = {}  # type: Dict[complex, List[int]]
+    for index, start in enumerate(starts):
+        segments_by_start.setdefault(start, []).append(index)
+    used = [False] * len(starts)
+    end_points = set(ends)
+    # Start with the segments that no other segment connects to, so open chains are followed from their beginning.
+    first_segments = [index for index, start in enumerate(starts) if start not in end_points]
+    result = []  # type: Contours
+    for first in first_segments + list(range(len(starts))):
+        if used[first]:
+            continue
+        used[first] = True
+        chain = [starts[first], ends[first]]
+        while True:
+            candidates = segments_by_start.get(chain[-1])
+            while candidates and used[candidates[-1]]:
+                candidates.pop()
+            if not candidates:
+                break
+            index = candidates.pop()
+            used[index] = True
+            chain.append(ends[index])
+        result.append((numpy.array(chain, dtype=numpy.complex128), chain[0] == chain[-1]))
+    return result
@@ -0,0 +1,20 @@
+class ProcessingCancelled(Exception):
+    pass
+
+
+# Cooperative cancellation of processing. The processor calls check() between stages and steps,
+# which raises ProcessingCancelled once cancel() has been called from another thread.
+class CancelToken:
+    def __init__(self) -> None:
+        self.__cancelled = False
+
+    def cancel(self) -> None:
+        self.__cancelled = True
+
+    @property
+    def cancelled(self) -> bool:
+        return self.__cancelled
+
+    def check(self) -> None:
+        if self.__cancelled:
+            raise ProcessingCancelled()
@@ -30,8 +30,10 @@ class Collector:
                         job.addClosed(path.getPoints())
                     else:
                         job.addOpen(path.getPoints())
-            if isinstance(document, DocumentImageNode):
-                job.addImage(document.qimage)
+            # Heightmaps are only used by surface operations, and can be expensive to create.
+            # They are placed where the node is, so moving the node with setOrigin also moves its surface toolpath.
+            if isinstance(document, DocumentImageNode) and job.settings.surface_depth > 0.0:
+                job.addHeightmap(document.getHeightmap(), origin=document.origin, pixel_size=document.pixel_size)
         for child in document:
             self.__collect(child, collection_index)
 
@@ -1,27 +1,41 @@
 import logging
+import multiprocessing
+import os
 import threading
 import time
-from typing import Optional
+from concurrent.futures import Future, ProcessPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional, List
 
 from PyQt5.QtCore import QModelIndex
 
 from nk3.document.node import DocumentNode
 from nk3.machine.machine import Machine
 from nk3.machine.tool import Tool
+from nk3.processor.cancelToken import CancelToken, ProcessingCancelled
 from nk3.processor.collector import Collector
-from nk3.processor.processor import Processor
+from nk3.processor.job import Job
+from nk3.processor.processor import processJob
 from nk3.processor.result import Result
+from nk3.processor.resultCache import ResultCache
 from nk3.qt.QObjectList import QObjectList
 from nk3.settingInstance import SettingInstance
 
 
 class Dispatcher:
-    def __init__(self, document_list: QObjectList[DocumentNode]) -> None:
+    # process_pool_size: Amount of worker processes used to process jobs in parallel.
+    #                    Defaults to the amount of CPUs, 1 or less processes all jobs on the dispatcher thread.
+    # cache_size: Amount of job results kept, so unchanged jobs do not need to be processed again.
+    def __init__(self, document_list: QObjectList[DocumentNode], *, process_pool_size: Optional[int] = None, cache_size: int = 32) -> None:
         self.onResultData = lambda result: None
         self.__machine = None  # type: Optional[Machine]
         self.__document_list = document_list
+        self.__process_pool_size = process_pool_size if process_pool_size is not None else (os.cpu_count() or 1)
+        self.__process_pool = None  # type: Optional[ProcessPoolExecutor]
+        self.__cache = ResultCache(cache_size)
 
         self.__trigger = threading.Event()
+        self.__cancel_token = CancelToken()
         self.__thread = threading.Thread(target=self.__handler, daemon=True)
         self.__thread.start()
 
@@ -81,16 +95,22 @@ class Dispatcher:
             self.__disconnectFromDocumentNode(child)
 
     def trigger(self) -> None:
+        # Abandon any processing in progress, as its result will be outdated.
+        self.__cancel_token.cancel()
         self.__trigger.set()
 
     def __handler(self) -> None:
         while True:
             self.__trigger.wait()
             time.sleep(0.01)
+            # Clear the trigger before replacing the token, so a trigger in between cancels nothing and is not lost.
             self.__trigger.clear()
+            self.__cancel_token = CancelToken()
 
             try:
                 self.__process()
+            except ProcessingCancelled:
+                logging.info("Processing cancelled by newer trigger")
             except:
                 logging.exception("Exception during processing")
 
@@ -100,8 +120,55 @@ class Dispatcher:
         machine = self.__machine
         if machine is not None:
             collector = Collector(self.__document_list, machine)
-            for job in collector.getJobs():
-                Processor(job).process(result)
+            for partial_result in self.__processJobs(list(collector.getJobs())):
+                result.merge(partial_result)
         # Notify the main application of new processed data.
         # The main application can display this and export it.
         self.onResultData(result)
+
+    # Process each job into a partial result, in job order.
+    # Jobs that did not change since they were last processed reuse their cached result.
+    def __processJobs(self, jobs: List[Job]) -> List[Result]:
+        keys = [job.getCacheKey() for job in jobs]
+        results = [self.__cache.get(key) for key in keys]  # type: List[Optional[Result]]
+        dirty = [index for index, cached in enumerate(results) if cached is None]
+        if self.__process_pool_size > 1 and len(dirty) > 1:
+            for index, processed in zip(dirty, self.__processParallel([jobs[index] for index in dirty])):
+                results[index] = processed
+        else:
+            for index in dirty:
+                results[index] = processJob(jobs[index], self.__cancel_token)
+        final_results = []
+        for key, result in zip(keys, results):
+            assert result is not None
+            self.__cache.put(key, result)
+            final_results.append(result)
+        return final_results
+
+    # Process each job in a worker process.
+    def __processParallel(self, jobs: List[Job]) -> List[Result]:
+        if self.__process_pool is None:
+            # Use spawn instead of fork, forking a process with Qt and its threads running is not safe.
+            self.__process_pool = ProcessPoolExecutor(self.__process_pool_size, mp_context=multiprocessing.get_context("spawn"))
+        futures = [self.__process_pool.submit(processJob, job) for job in jobs]
+        results = []
+        try:
+            for future in futures:
+                results.append(self.__waitForResult(future))
+        except ProcessingCancelled:
+            # Workers that already started will finish their job, but the ones that did not start yet are dropped.
+            for future in futures:
+                future.cancel()
+            raise
+        except BrokenProcessPool:
+            self.__process_pool = None
+            raise
+        return results
+
+    def __waitForResult(self, future: "Future[Result]") -> Result:
+        while True:
+            self.__cancel_token.check()
+            try:
+                return future.result(timeout=0.05)
+            except TimeoutError:
+                pass
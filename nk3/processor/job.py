@@ -1,23 +1,30 @@
-from typing import List
+import hashlib
+from typing import List, Tuple
 
-from PyQt5.QtGui import QImage
+import numpy
+import numpy.typing
 
-from nk3.machine.machine import Machine
-from nk3.machine.operation import Operation
-from nk3.machine.tool import Tool
 from nk3.processor import pathUtils
 from nk3.processor.processorSettings import ProcessorSettings
 
+# Jobs are sent to worker processes, keep the imports light so unpickling a job does not pull in the whole application.
+MYPY = False
+if MYPY:
+    from nk3.machine.machine import Machine
+    from nk3.machine.operation import Operation
+    from nk3.machine.tool import Tool
+
 
 class Job:
-    def __init__(self, machine: Machine, tool: Tool, operation: Operation) -> None:
+    def __init__(self, machine: "Machine", tool: "Tool", operation: "Operation") -> None:
         self.__settings = ProcessorSettings()
         machine.fillProcessorSettings(self.__settings)
         tool.fillProcessorSettings(self.__settings)
         operation.fillProcessorSettings(self.__settings)
         self.__open_paths = pathUtils.Paths()
         self.__closed_paths = pathUtils.Paths()
-        self.__images: List[QImage] = []
+        # Each heightmap with the document position of its pixel [0, 0] corner, and the size of its pixels.
+        self.__heightmaps: List[Tuple[numpy.typing.NDArray[numpy.float32], complex, float]] = []
 
     def addOpen(self, points: List[complex]) -> None:
         self.__open_paths.addPath(points, False)
@@ -25,8 +32,24 @@ class Job:
     def addClosed(self, points: List[complex]) -> None:
         self.__closed_paths.addPath(points, True)
 
-    def addImage(self, image: QImage) -> None:
-        self.__images.append(image)
+    def addHeightmap(self, heightmap: numpy.typing.NDArray[numpy.float32], *, origin: complex = complex(), pixel_size: float = 1.0) -> None:
+        self.__heightmaps.append((heightmap, origin, pixel_size))
+
+    # Hash of the settings and input geometry, jobs with the same key produce the same result.
+    # Needs to be called before the job is processed, as processing modifies the paths.
+    def getCacheKey(self) -> str:
+        h = hashlib.sha1()
+        h.update(repr(sorted(vars(self.__settings).items())).encode())
+        for paths in (self.__open_paths, self.__closed_paths):
+            h.update(len(paths).to_bytes(8, "little"))
+            for path in paths:
+                h.update(b"C" if path.closed else b"O")
+                h.update(len(path).to_bytes(8, "little"))
+                h.update(path.points.tobytes())
+        for heightmap, origin, pixel_size in self.__heightmaps:
+            h.update(repr((heightmap.shape, origin, pixel_size)).encode())
+            h.update(heightmap.tobytes())
+        return h.hexdigest()
 
     @property
     def settings(self) -> ProcessorSettings:
@@ -41,6 +64,6 @@ class Job:
         return self.__open_paths
 
     @property
-    def images(self) -> List[QImage]:
-        return self.__images
+    def heightmaps(self) -> List[Tuple[numpy.typing.NDArray[numpy.float32], complex, float]]:
+        return self.__heightmaps
 
@@ -0,0 +1,204 @@
+import math
+from typing import List, Dict, Tuple, Optional
+
+import numpy
+import numpy.typing
+
+from nk3.processor import pathUtils
+from nk3.processor.cancelToken import CancelToken
+
+
+# Orders a set of paths to minimize the travel moves between them.
+# A greedy nearest neighbour pick is done with the help of a uniform grid over all possible entry points of the paths.
+# Closed paths can be entered at any vertex, as Path.shiftStartTowards will re-seat the start, so all their vertices are
+# added to the grid. Open paths can only be entered at their start.
+# After the greedy pick, a 2-opt pass improves the order until it evaluated improve_evaluations possible reversals.
+# This limit does not depend on the speed of the machine, so the same paths always give the same order.
+class PathOrderer:
+    def __init__(self, paths: List[pathUtils.Path], start: complex, *, improve_evaluations: int = 0, cancel_token: Optional[CancelToken] = None) -> None:
+        self.__paths = paths
+        self.__start = start
+        self.__improve_evaluations = improve_evaluations
+        self.__cancel_token = cancel_token if cancel_token is not None else CancelToken()
+
+        self.__order = []  # type: List[int]
+        self.__entry_points = []  # type: List[complex]
+        self.__travel_distance = 0.0
+        self.__evaluations = 0
+
+        if len(self.__paths) > 0:
+            self.__pickGreedy()
+            if self.__improve_evaluations > 0:
+                self.__improve()
+        self.__travel_distance = self.__calculateTravel(self.__entry_points)
+
+    @property
+    def paths(self) -> List[pathUtils.Path]:
+        return [self.__paths[index] for index in self.__order]
+
+    # Position where the tool ends up after the last path. Closed paths end where they started.
+    @property
+    def end(self) -> complex:
+        if not self.__entry_points:
+            return self.__start
+        return self.__entry_points[-1]
+
+    @property
+    def travelDistance(self) -> float:
+        return self.__travel_distance
+
+    # Amount of reversals the 2-opt pass evaluated, at most improve_evaluations.
+    @property
+    def evaluations(self) -> int:
+        return self.__evaluations
+
+    # Travel distance when the paths would be processed in the order they were given.
+    def unorderedTravelDistance(self) -> float:
+        entry_points = []
+        p0 = self.__start
+        for path in self.__paths:
+            p0 = self.__closestEntry(path, p0)
+            entry_points.append(p0)
+        return self.__calculateTravel(entry_points)
+
+    def __calculateTravel(self, entry_points: List[complex]) -> float:
+        if not entry_points:
+            return 0.0
+        points = numpy.array([self.__start] + entry_points, dtype=numpy.complex128)
+        return float(numpy.sum(numpy.abs(numpy.diff(points))))
+
+    @staticmethod
+    def __closestEntry(path: pathUtils.Path, point: complex) -> complex:
+        if not path.closed:
+            return path[0]
+        return complex(path.points[int(numpy.argmin(numpy.abs(path.points - point)))])
+
+    def __pickGreedy(self) -> None:
+        point_list = []  # type: List[complex]
+        point_path_index = []  # type: List[int]
+        for index, path in enumerate(self.__paths):
+            if path.closed:
+                point_list += path.points.tolist()
+                point_path_index += [index] * len(path)
+            else:
+                point_list.append(path[0])
+                point_path_index.append(index)
+        points = numpy.array(point_list, dtype=numpy.complex128)
+
+        # Size the grid cells so that on average a cell contains a few points.
+        min_xy = complex(float(numpy.min(points.real)), float(numpy.min(points.imag)))
+        size = complex(float(numpy.max(points.real)), float(numpy.max(points.imag))) - min_xy
+        cell_size = max(math.sqrt(max(size.real, 1.0) * max(size.imag, 1.0) / len(points)) * 2.0, 0.001)
+        cell_x = numpy.floor((points.real - min_xy.real) / cell_size).astype(numpy.int64)
+        cell_y = numpy.floor((points.imag - min_xy.imag) / cell_size).astype(numpy.int64)
+        grid_width = int(numpy.max(cell_x)) + 1
+        grid_height = int(numpy.max(cell_y)) + 1
+
+        grid = {}  # type: Dict[Tuple[int, int], List[int]]
+        for point_index, key in enumerate(zip(cell_x.tolist(), cell_y.tolist())):
+            grid.setdefault(key, []).append(point_index)
+
+        picked = [False] * len(self.__paths)
+        p0 = self.__start
+        for pick_count in range(len(self.__paths)):
+            if pick_count % 1000 == 0:
+                self.__cancel_token.check()
+            # Clamp the search center into the grid, the ring distance stays a valid lower bound this way.
+            center_x = min(max(int(math.floor((p0.real - min_xy.real) / cell_size)), 0), grid_width - 1)
+            center_y = min(max(int(math.floor((p0.imag - min_xy.imag) / cell_size)), 0), grid_height - 1)
+            best_index = -1
+            best_distance = float("inf")
+            ring = 0
+            while True:
+                for key in self.__ring(center_x, center_y, ring, grid_width, grid_height):
+                    cell = grid.get(key)
+                    if cell is None:
+                        continue
+                    # Lazily remove points of paths that have already been picked.
+                    cell[:] = [point_index for point_index in cell if not picked[point_path_index[point_index]]]
+                    for point_index in cell:
+                        distance = abs(point_list[point_index] - p0)
+                        if distance < best_distance:
+                            best_distance = distance
+                            best_index = point_index
+                # Any point in a further ring is at least this far away from p0.
+                ring_distance = ring * cell_size
+                if best_index > -1 and best_distance <= ring_distance:
+                    break
+                if not self.__ringInGrid(center_x, center_y, ring, grid_width, grid_height):
+                    break
+                ring += 1
+            assert best_index > -1
+            path_index = point_path_index[best_index]
+            picked[path_index] = True
+            self.__order.append(path_index)
+            p0 = point_list[best_index]
+            self.__entry_points.append(p0)
+
+    @staticmethod
+    def __ring(center_x: int, center_y: int, ring: int, grid_width: int, grid_height: int) -> List[Tuple[int, int]]:
+        if ring == 0:
+            return [(center_x, center_y)]
+        min_x, max_x = max(center_x - ring, 0), min(center_x + ring, grid_width - 1)
+        min_y, max_y = max(center_y - ring + 1, 0), min(center_y + ring - 1, grid_height - 1)
+        result = []
+        if center_y - ring >= 0:
+            result += [(x, center_y - ring) for x in range(min_x, max_x + 1)]
+        if center_y + ring < grid_height:
+            result += [(x, center_y + ring) for x in range(min_x, max_x + 1)]
+        if center_x - ring >= 0:
+            result += [(center_x - ring, y) for y in range(min_y, max_y + 1)]
+        if center_x + ring < grid_width:
+            result += [(center_x + ring, y) for y in range(min_y, max_y + 1)]
+        return result
+
+    @staticmethod
+    def __ringInGrid(center_x: int, center_y: int, ring: int, grid_width: int, grid_height: int) -> bool:
+        return center_x - ring > 0 or center_y - ring > 0 or center_x + ring < grid_width - 1 or center_y + ring < grid_height - 1
+
+    # 2-opt: Reverse parts of the order when that shortens the travel. The start position is fixed, the end is free.
+    def __improve(self) -> None:
+        points = numpy.array([self.__start] + self.__entry_points, dtype=numpy.complex128)
+        order = numpy.array([-1] + self.__order, dtype=numpy.int64)
+        improved = True
+        while improved:
+            improved = False
+            for i in range(1, len(points) - 1):
+                self.__cancel_token.check()
+                if self.__evaluations >= self.__improve_evaluations:
+                    improved = False
+                    break
+                # Reverse points[i:j+1] for each j > i, calculate the change in travel distance.
+                a = points[i - 1]
+                b = points[i]
+                c = points[i + 1:]
+                self.__evaluations += len(c)
+                delta = numpy.abs(a - c) - abs(a - b)
+                d = points[i + 2:]
+                delta[:-1] += numpy.abs(b - d) - numpy.abs(c[:-1] - d)
+                k = int(numpy.argmin(delta))
+                if delta[k] < -1e-6:
+                    # Only the travel from points[i - 1] on changes.
+                    j = i + 1 + k
+                    new_points = points[i - 1:].copy()
+                    new_order = order[i - 1:].copy()
+                    new_points[1:j + 2 - i] = points[i:j + 1][::-1]
+                    new_order[1:j + 2 - i] = order[i:j + 1][::-1]
+                    self.__reseatEntries(new_points, new_order, j + 1 - i)
+                    # Moving the entry points changes the travel after the reversed part as well, so check the total.
+                    if numpy.sum(numpy.abs(numpy.diff(new_points))) < numpy.sum(numpy.abs(numpy.diff(points[i - 1:]))) - 1e-6:
+                        points[i - 1:] = new_points
+                        order[i - 1:] = new_order
+                        improved = True
+        self.__entry_points = points[1:].tolist()
+        self.__order = order[1:].tolist()
+
+    # After reversing points[1:end+1], closed paths are entered at their vertex closest to the previous path again.
+    # After the reversed part this stops at the first path that is entered at the same point as before.
+    def __reseatEntries(self, points: numpy.typing.NDArray[numpy.complex128], order: numpy.typing.NDArray[numpy.int64], end: int) -> None:
+        for index in range(1, len(points)):
+            path = self.__paths[int(order[index])]
+            entry = self.__closestEntry(path, complex(points[index - 1]))
+            if index > end and entry == points[index]:
+                break
+            points[index] = entry
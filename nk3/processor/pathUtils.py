@@ -1,15 +1,27 @@
+import numpy
+import numpy.typing
 import pyclipper
-from typing import List, Tuple, Iterable, Set, Iterator
+from typing import List, Tuple, Iterable, Set, Iterator, Union
 
+PointArray = numpy.typing.NDArray[numpy.complex128]
+ClipperArray = numpy.typing.NDArray[numpy.float64]
 
 
 def dot(p0: complex, p1: complex) -> float:
     return p0.real * p1.real + p0.imag * p1.imag
 
 
+def _fromClipperPoints(points: List[Tuple[float, float]]) -> PointArray:
+    if len(points) < 1:
+        return numpy.zeros(0, dtype=numpy.complex128)
+    return (numpy.array(points, dtype=numpy.float64) / 1000.0).view(numpy.complex128).reshape(-1)
+
+
+# Points are stored in a contiguous complex128 array, which in memory is the same as an Nx2 float64 array.
+# This allows vectorized operations on the whole path, while keeping the complex number API used everywhere else.
 class Path:
-    def __init__(self, points: List[complex], closed: bool) -> None:
-        self.__points = points
+    def __init__(self, points: Union[List[complex], PointArray], closed: bool) -> None:
+        self.__points = numpy.ascontiguousarray(points, dtype=numpy.complex128).reshape(-1)
         self.__depth_at_distance = []  # type: List[Tuple[float, float]]
         self.__closed = closed
         self.__tags = set()  # type: Set[str]
@@ -25,49 +37,50 @@ class Path:
             return
         assert len(self.__depth_at_distance) == 0
 
-        best_index = None
-        for idx in range(len(self.__points)):
-            if best_index is None or abs(point - self.__points[best_index]) > abs(point - self.__points[idx]):
-                best_index = idx
-        if best_index is not None:
-            p0 = self.__points[best_index - 1]
-            p1 = self.__points[best_index]
-            p2 = self.__points[(best_index + 1) % len(self.__points)]
-            dist0 = abs(p0 - p1)
-            dist2 = abs(p2 - p1)
-            norm0 = (p0 - p1) / dist0
-            norm2 = (p2 - p1) / dist2
-            dot0 = dot(point - p1, norm0)
-            dot2 = dot(point - p1, norm2)
-            dot0 = max(0.0, min(dot0, dist0))
-            dot2 = max(0.0, min(dot2, dist2))
-            q0 = p1 + norm0 * dot0
-            q2 = p1 + norm2 * dot2
-            if abs(q0 - point) > abs(q2 - point):
-                q0 = q2
-                best_index = (best_index + 1) % len(self.__points)
-            if abs(q0 - self.__points[best_index]) == 0.0:
-                self.__points = self.__points[best_index:] + self.__points[:best_index]
-            else:
-                self.__points = [q0] + self.__points[best_index:] + self.__points[:best_index]
+        if len(self.__points) < 1:
+            return
+
+        best_index = int(numpy.argmin(numpy.abs(self.__points - point)))
+        p0 = complex(self.__points[best_index - 1])
+        p1 = complex(self.__points[best_index])
+        p2 = complex(self.__points[(best_index + 1) % len(self.__points)])
+        dist0 = abs(p0 - p1)
+        dist2 = abs(p2 - p1)
+        norm0 = (p0 - p1) / dist0
+        norm2 = (p2 - p1) / dist2
+        dot0 = dot(point - p1, norm0)
+        dot2 = dot(point - p1, norm2)
+        dot0 = max(0.0, min(dot0, dist0))
+        dot2 = max(0.0, min(dot2, dist2))
+        q0 = p1 + norm0 * dot0
+        q2 = p1 + norm2 * dot2
+        if abs(q0 - point) > abs(q2 - point):
+            q0 = q2
+            best_index = (best_index + 1) % len(self.__points)
+        shifted = numpy.roll(self.__points, -best_index)
+        if abs(q0 - shifted[0]) == 0.0:
+            self.__points = shifted
+        else:
+            self.__points = numpy.concatenate(([q0], shifted))
 
     def removeDuplicates(self) -> None:
-        idx = 0 if self.__closed else 1
-        while idx < len(self.__points):
-            if self.__points[idx - 1] == self.__points[idx]:
-                self.__points.pop(idx)
-            else:
-                idx += 1
+        if len(self.__points) < 1:
+            return
+        keep = self.__points != numpy.roll(self.__points, 1)
+        if not self.__closed:
+            keep[0] = True
+        self.__points = self.__points[keep]
 
     def scoreCornering(self, start_offset: float, end_offset: float) -> float:
-        p0 = self.__points[0]
-        p1 = self.__points[0]
+        points = self.__points.tolist()  # type: List[complex]
+        p0 = points[0]
+        p1 = points[0]
         offset = 0.0
         idx = 0
         corner_dot_values = []
         while offset < end_offset:
-            p2 = self.__points[idx]
-            idx = (idx + 1) % len(self.__points)
+            p2 = points[idx]
+            idx = (idx + 1) % len(points)
             offset += abs(p1 - p0)
             if start_offset < offset < end_offset and p0 != p1 and p1 != p2:
                 norm0 = (p1 - p0) / abs(p1 - p0)
@@ -101,7 +114,7 @@ class Path:
 
     def iterateDepthPoints(self) -> Iterable[Tuple[complex, float]]:
         done_distance = 0.0
-        points = self.__points
+        points = self.__points.tolist()  # type: List[complex]
         if not self.__closed:
             points = points + list(reversed(points[1:-1]))
         p0 = points[0]
@@ -131,20 +144,19 @@ class Path:
             p0 = p1
 
     def length(self) -> float:
-        if len(self.__points) < 1:
+        if len(self.__points) < 2:
             return 0.0
-        result = 0.0
+        result = float(numpy.sum(numpy.abs(numpy.diff(self.__points))))
         if self.__closed:
-            p0 = self.__points[-1]
-        else:
-            p0 = self.__points[0]
-        for p1 in self.__points:
-            result += abs(p0 - p1)
-            p0 = p1
+            result += abs(self.__points[0] - self.__points[-1])
         return result
 
-    def _toClipper(self) -> List[Tuple[float, float]]:
-        return [(p.real * 1000.0, p.imag * 1000.0) for p in self.__points]
+    def _toClipper(self) -> ClipperArray:
+        return self.__points.view(numpy.float64).reshape(-1, 2) * 1000.0
+
+    @property
+    def points(self) -> PointArray:
+        return self.__points
 
     @property
     def closed(self) -> bool:
@@ -154,7 +166,7 @@ class Path:
         return len(self.__points)
 
     def __getitem__(self, item: int) -> complex:
-        return self.__points[item]
+        return complex(self.__points[item])
 
 
 class Paths:
@@ -195,7 +207,7 @@ class Paths:
     def clear(self) -> None:
         self.__paths.clear()
 
-    def _toClipper(self) -> List[List[Tuple[float, float]]]:
+    def _toClipper(self) -> List[ClipperArray]:
         result = [path._toClipper() for path in self.__paths]
         for child in self.__children:
             result += child._toClipper()
@@ -206,14 +218,14 @@ class Paths:
         self.__paths.clear()
         self.__children.clear()
         for path in paths:
-            self.__paths.append(Path([complex(p[0] / 1000.0, p[1] / 1000) for p in path], True))
+            self.__paths.append(Path(_fromClipperPoints(path), True))
         return self
 
     def _fromClipperTree(self, node: pyclipper.PyPolyNode) -> "Paths":
         self.__paths.clear()
         self.__children.clear()
         self.__is_hole = node.IsHole
-        self.__paths.append(Path([complex(p[0] / 1000.0, p[1] / 1000) for p in node.Contour], not node.IsOpen))
+        self.__paths.append(Path(_fromClipperPoints(node.Contour), not node.IsOpen))
         for child in node.Childs:
             c = Paths()
             c._fromClipperTree(child)
@@ -2,23 +2,36 @@ import logging
 import math
 from typing import List, Optional
 
+import numpy
+
 from nk3.depthFirstIterator import DepthFirstIterator
 from nk3.processor import pathUtils
+from nk3.processor.cancelToken import CancelToken
 from nk3.processor.job import Job
+from nk3.processor.pathOrderer import PathOrderer
 from nk3.processor.result import Result
 from nk3.processor.tabGenerator import TabGenerator
 
 
+# Process a single job into a new result. Used as entry point for worker processes.
+def processJob(job: Job, cancel_token: Optional[CancelToken] = None) -> Result:
+    result = Result()
+    Processor(job, cancel_token).process(result)
+    return result
+
+
 class Processor:
-    def __init__(self, job: Job) -> None:
+    def __init__(self, job: Job, cancel_token: Optional[CancelToken] = None) -> None:
         self.__job = job
+        self.__cancel_token = cancel_token if cancel_token is not None else CancelToken()
 
     def process(self, result: Result) -> None:
         # Process paths with pyclipper (offsets)
         path_tree = self.__process2d(result)
+        self.__cancel_token.check()
         # Generate pockets
         self.__processPockets(path_tree)
-        path_list = self.__orderPaths(path_tree)
+        path_list = self.__orderPaths(path_tree, result)
         # Convert 2d paths to 3d paths
         self.__processToMoves(path_list, result)
         self.__processSurface(result)
@@ -42,6 +55,7 @@ class Processor:
 
     def __processPockets(self, path_tree: pathUtils.Paths) -> None:
         for paths in DepthFirstIterator(path_tree, include_root=False, iter_function=lambda n: n.children):
+            self.__cancel_token.check()
             if self.__needPocket(paths):
                 # Combine our childs into ourselves, so the pocket becomes a single Paths group.
                 for child in paths.children:
@@ -50,6 +64,7 @@ class Processor:
                 prev = paths
                 result = prev.offset(-abs(self.__job.settings.pocket_offset))
                 while len(result) > 0:
+                    self.__cancel_token.check()
                     paths.addChild(result)
                     prev = result
                     result = prev.offset(-abs(self.__job.settings.pocket_offset))
@@ -58,18 +73,31 @@ class Processor:
                     path.addTag("tabs")
 
     def __processSurface(self, result: Result) -> None:
-        if self.__job.settings.surface_depth > 0.0 and self.__job.settings.surface_offset > 0.0:
-            for image in self.__job.images:
-                h = image.height()
+        surface_depth = self.__job.settings.surface_depth
+        surface_offset = self.__job.settings.surface_offset
+        if surface_depth > 0.0 and surface_offset > 0.0:
+            for heightmap, origin, pixel_size in self.__job.heightmaps:
+                h, w = heightmap.shape
+                # Sample each scanline at the stepover distance, and always include the last pixel of the line.
+                # The scanlines are stepped in pixels, and converted to document coordinates for the moves.
+                step = surface_offset / pixel_size
+                sample_x = numpy.append(numpy.arange(0.0, w - 1, step), w - 1)
                 y = 0.0
                 left_to_right = True
                 while y < h:
-                    for x in range(image.width()) if left_to_right else range(image.width() - 1, 0, -1):
-                        result.addMove(complex(x, y), (1.0 - (image.pixelColor(int(x), int(h - 1 - y)).value() & 0xFF) / 255) * -self.__job.settings.surface_depth)
-                    y += self.__job.settings.surface_offset
+                    self.__cancel_token.check()
+                    z = (heightmap[int(y), sample_x.astype(numpy.int64)] - 1.0) * surface_depth
+                    x = sample_x
+                    if not left_to_right:
+                        x, z = x[::-1], z[::-1]
+                    # Merge runs of the same depth into a single move, by only keeping the start and end of each run.
+                    keep = numpy.ones(len(z), dtype=bool)
+                    keep[1:-1] = (z[1:-1] != z[:-2]) | (z[1:-1] != z[2:])
+                    result.addMoves(origin + (x[keep] + 1j * y) * pixel_size, z[keep].astype(numpy.float64))
+                    y += step
                     left_to_right = not left_to_right
 
-    def __orderPaths(self, path_tree: pathUtils.Paths) -> List[pathUtils.Path]:
+    def __orderPaths(self, path_tree: pathUtils.Paths, result: Result) -> List[pathUtils.Path]:
         pick_lists: List[List[pathUtils.Path]] = []
         def add_picks(tree: pathUtils.Paths, depth: int) -> None:
             for path in tree:
@@ -82,21 +110,19 @@ class Processor:
                 add_picks(child, depth + 1)
         add_picks(path_tree, 0)
 
-        result = []
+        path_list = []
         p0 = complex(0, 0)
+        travel_saved = 0.0
+        # All levels share the improve budget of the job.
+        improve_evaluations = self.__job.settings.order_improve_evaluations
         while len(pick_lists) > 0:
-            pick_list = pick_lists.pop()
-            while len(pick_list) > 0:
-                best_index = None  # type: Optional[int]
-                best_distance = 0.0
-                for index in range(0, len(pick_list)):
-                    distance = abs(pick_list[index][0] - p0)
-                    if best_index is None or distance < best_distance:
-                        best_index = index
-                        best_distance = distance
-                assert best_index is not None
-                result.append(pick_list.pop(best_index))
-        return result
+            orderer = PathOrderer(pick_lists.pop(), p0, improve_evaluations=improve_evaluations, cancel_token=self.__cancel_token)
+            improve_evaluations -= orderer.evaluations
+            path_list += orderer.paths
+            p0 = orderer.end
+            travel_saved += orderer.unorderedTravelDistance() - orderer.travelDistance
+        result.addTravelSaved(travel_saved)
+        return path_list
 
     def __processToMoves(self, path_list: List[pathUtils.Path], result: Result) -> None:
         cut_depth_total = self.__job.settings.cut_depth_total
@@ -121,6 +147,7 @@ class Processor:
         if result.getLastXY() is None:
             result.addTravel(complex(0, 0), self.__job.settings.travel_height)
         for path in path_list:
+            self.__cancel_token.check()
             last_xy = result.getLastXY()
             if last_xy is not None:
                 path.shiftStartTowards(last_xy)
@@ -152,8 +179,8 @@ class Processor:
                 TabGenerator(self.__job.settings, path)
 
             result.addTravel(path[0], self.__job.settings.travel_height)
-            for point, height in path.iterateDepthPoints():
-                result.addMove(point, height)
+            depth_points = list(path.iterateDepthPoints())
+            result.addMoves(numpy.array([point for point, _ in depth_points], dtype=numpy.complex128), numpy.array([height for _, height in depth_points], dtype=numpy.float64))
             last_xy = result.getLastXY()
             assert last_xy is not None
             result.addTravel(last_xy, self.__job.settings.travel_height)
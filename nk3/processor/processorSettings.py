@@ -18,3 +18,7 @@ class ProcessorSettings:
 
         self.surface_depth = 0.0
         self.surface_offset = 0.0
+
+        # Maximum amount of reversals evaluated per job to improve the path order after the initial nearest neighbour pick.
+        # A count instead of a time limit, so the same job always gives the same toolpath.
+        self.order_improve_evaluations = 10000000
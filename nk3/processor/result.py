@@ -1,19 +1,34 @@
-from typing import NamedTuple, List, Iterator, Optional
+from typing import NamedTuple, Iterator, Optional, Tuple, Dict, Any
+
+import numpy
+import numpy.typing
 
 from nk3.processor.pathUtils import Paths
 
 Move = NamedTuple('Move', [('xy', complex), ('z', float), ('speed', float)])
 
+# Moves are stored in a structured array, instead of a list of Move objects, as there can be millions of them.
+MOVE_DTYPE = numpy.dtype([("x", numpy.float64), ("y", numpy.float64), ("z", numpy.float64), ("speed", numpy.float64), ("flags", numpy.uint8)])
+MoveArray = numpy.typing.NDArray[numpy.void]
+
+FLAG_TRAVEL = 0x01
+
 
 class Result:
+    __INITIAL_CAPACITY = 1024
+    __ITERATE_CHUNK_SIZE = 4096
+
     def __init__(self) -> None:
-        self.__moves = []  # type: List[Move]
+        self.__moves = numpy.zeros(self.__INITIAL_CAPACITY, dtype=MOVE_DTYPE)
+        self.__move_count = 0
+        self.__last_move = None  # type: Optional[Tuple[complex, float]]
         self.__xy_speed = 0.0
         self.__xy_travel_speed = 0.0
         self.__z_down_speed = 0.0
         self.__z_up_speed = 0.0
 
         self.__problem_regions = Paths()
+        self.__travel_saved = 0.0
 
     def setSpeeds(self, *, xy_speed: float, xy_travel_speed: float, z_down_speed: float, z_up_speed: float) -> None:
         self.__xy_speed = xy_speed
@@ -22,16 +37,70 @@ class Result:
         self.__z_up_speed = z_up_speed
 
     def addMove(self, xy: complex, z: float) -> None:
-        self.__addMove(xy, z, self.__xy_speed)
+        self.__addMove(xy, z, self.__xy_speed, 0)
 
     def addTravel(self, xy: complex, z: float) -> None:
-        self.__addMove(xy, z, self.__xy_travel_speed)
+        self.__addMove(xy, z, self.__xy_travel_speed, FLAG_TRAVEL)
+
+    # Add a batch of moves at once, with the same result as calling addMove/addTravel for each of them.
+    def addMoves(self, xy: numpy.typing.NDArray[numpy.complex128], z: numpy.typing.NDArray[numpy.float64], *, travel: bool = False) -> None:
+        if len(xy) < 1:
+            return
+        xy_speed = self.__xy_travel_speed if travel else self.__xy_speed
+        if self.__last_move is not None:
+            xy = numpy.concatenate(([self.__last_move[0]], xy))
+            z = numpy.concatenate(([self.__last_move[1]], z))
+
+        # Moves that end up within 0.01mm of the previous move are dropped.
+        keep = numpy.ones(len(xy), dtype=bool)
+        keep[1:] = numpy.hypot(numpy.abs(numpy.diff(xy)), numpy.diff(z)) > 0.01
+        dropped = numpy.flatnonzero(~keep)
+        if len(dropped) > 0:
+            # After a dropped move, the next moves need to be compared with the last kept move instead, until one is kept.
+            # From there on the moves follow a kept move again, so the first pass is right up to the next move it dropped.
+            last_kept = int(dropped[0]) - 1
+            index = last_kept + 2
+            while index < len(xy):
+                if abs(complex(abs(xy[index] - xy[last_kept]), z[index] - z[last_kept])) > 0.01:
+                    keep[index] = True
+                    next_dropped = int(numpy.searchsorted(dropped, index, side="right"))
+                    if next_dropped >= len(dropped):
+                        break
+                    last_kept = int(dropped[next_dropped]) - 1
+                    index = last_kept + 2
+                else:
+                    keep[index] = False
+                    index += 1
+        xy = xy[keep]
+        z = z[keep]
+
+        speed = numpy.full(len(xy), xy_speed, dtype=numpy.float64)
+        xy_distance = numpy.abs(numpy.diff(xy))
+        z_distance = numpy.diff(z)
+        total_distance = numpy.hypot(xy_distance, z_distance)
+        z_speed = numpy.where(z_distance < 0, self.__z_down_speed, self.__z_up_speed)
+        # Same speed limiting as __addMove, for all moves at once.
+        with numpy.errstate(divide="ignore", invalid="ignore"):
+            combined_speed = numpy.minimum(xy_speed / xy_distance * total_distance, z_speed / numpy.abs(z_distance) * total_distance)
+        speed[1:] = numpy.where(xy_distance != 0.0, numpy.where(z_distance != 0.0, combined_speed, xy_speed), z_speed)
 
-    def __addMove(self, xy: complex, z: float, xy_speed: float) -> None:
+        if self.__last_move is not None:
+            xy, z, speed = xy[1:], z[1:], speed[1:]
+        if len(xy) < 1:
+            return
+        moves = self.__reserve(len(xy))
+        moves["x"] = xy.real
+        moves["y"] = xy.imag
+        moves["z"] = z
+        moves["speed"] = speed
+        moves["flags"] = FLAG_TRAVEL if travel else 0
+        self.__last_move = (complex(xy[-1]), float(z[-1]))
+
+    def __addMove(self, xy: complex, z: float, xy_speed: float, flags: int) -> None:
         speed = xy_speed
-        if len(self.__moves) > 0:
-            xy_distance = abs(self.__moves[-1].xy - xy)
-            z_distance = z - self.__moves[-1].z
+        if self.__last_move is not None:
+            xy_distance = abs(self.__last_move[0] - xy)
+            z_distance = z - self.__last_move[1]
             total_distance = abs(complex(xy_distance, z_distance))
             if total_distance <= 0.01:
                 return
@@ -45,42 +114,83 @@ class Result:
                 speed = xy_speed
             else:
                 speed = z_speed
-        self.__moves.append(Move(xy, z, speed))
+        self.__reserve(1)[0] = (xy.real, xy.imag, z, speed, flags)
+        self.__last_move = (xy, z)
+
+    # Grow the move storage when needed, and return a view on the next count entries.
+    def __reserve(self, count: int) -> MoveArray:
+        if self.__move_count + count > len(self.__moves):
+            capacity = max(len(self.__moves) * 2, self.__move_count + count)
+            moves = numpy.zeros(capacity, dtype=MOVE_DTYPE)
+            moves[:self.__move_count] = self.__moves[:self.__move_count]
+            self.__moves = moves
+        view = self.__moves[self.__move_count:self.__move_count + count]
+        self.__move_count += count
+        return view
+
+    # Append the moves of a result that was processed separately, as if they were added to this result directly.
+    def merge(self, other: "Result") -> None:
+        moves = other.moveArray
+        if self.__last_move is not None and len(moves) > 0:
+            xy_distance = abs(self.__last_move[0] - complex(moves[0]["x"], moves[0]["y"]))
+            z_distance = moves[0]["z"] - self.__last_move[1]
+            if abs(complex(xy_distance, z_distance)) <= 0.01:
+                moves = moves[1:]
+        if len(moves) > 0:
+            self.__reserve(len(moves))[:] = moves
+            self.__last_move = other.__last_move
+        self.__xy_speed = other.__xy_speed
+        self.__xy_travel_speed = other.__xy_travel_speed
+        self.__z_down_speed = other.__z_down_speed
+        self.__z_up_speed = other.__z_up_speed
+        self.__problem_regions.combine(other.__problem_regions)
+        self.__travel_saved += other.__travel_saved
+
+    # Only pickle the used part of the move storage, results are sent back from worker processes.
+    def __getstate__(self) -> Dict[str, Any]:
+        state = self.__dict__.copy()
+        state["_Result__moves"] = self.moveArray.copy()
+        return state
 
     def getLastXY(self) -> Optional[complex]:
-        if not self.__moves:
+        if self.__last_move is None:
             return None
-        return self.__moves[-1].xy
+        return self.__last_move[0]
 
     def addProblemRegions(self, paths: Paths) -> None:
         self.__problem_regions.combine(paths)
 
+    def addTravelSaved(self, distance: float) -> None:
+        self.__travel_saved += distance
+
     def addProblemPath(self, path: Paths) -> None:
         pass
 
+    # Zero-copy view on the moves, with the fields x, y, z, speed and flags.
+    @property
+    def moveArray(self) -> MoveArray:
+        return self.__moves[:self.__move_count]
+
     @property
     def moves(self) -> Iterator[Move]:
-        return iter(self.__moves)
+        for start in range(0, self.__move_count, self.__ITERATE_CHUNK_SIZE):
+            chunk = self.__moves[start:min(start + self.__ITERATE_CHUNK_SIZE, self.__move_count)]
+            for x, y, z, speed in zip(chunk["x"].tolist(), chunk["y"].tolist(), chunk["z"].tolist(), chunk["speed"].tolist()):
+                yield Move(complex(x, y), z, speed)
 
     def info(self) -> str:
-        if not self.__moves:
+        if self.__move_count == 0:
             return "Nothing to do"
-        minx, miny, minz = float("inf"), float("inf"), float("inf")
-        maxx, maxy, maxz = -float("inf"), -float("inf"), -float("inf")
-        prev = None
-        distance = 0
-        time = 0
-        for move in self.__moves:
-            if move.z > 0.0:
-                continue
-            minx = min(minx, move.xy.real)
-            maxx = max(maxx, move.xy.real)
-            miny = min(miny, move.xy.imag)
-            maxy = max(maxy, move.xy.imag)
-            minz = min(minz, move.z)
-            maxz = max(maxz, move.z)
-            if prev:
-                distance += abs(move.xy - prev.xy)
-                time += abs(move.xy - prev.xy) / move.speed
-            prev = move
-        return f"Area: {minx:g},{miny:g}->{maxx:g},{maxy:g}\nMax depth: {-minz:g}\nDistance: {distance:g}\nTime: {time:g}"
+        moves = self.moveArray
+        moves = moves[moves["z"] <= 0.0]
+        if len(moves) > 0:
+            minx, maxx = float(numpy.min(moves["x"])), float(numpy.max(moves["x"]))
+            miny, maxy = float(numpy.min(moves["y"])), float(numpy.max(moves["y"]))
+            minz = float(numpy.min(moves["z"]))
+        else:
+            minx, miny, minz = float("inf"), float("inf"), float("inf")
+            maxx, maxy = -float("inf"), -float("inf")
+        move_distances = numpy.hypot(numpy.diff(moves["x"]), numpy.diff(moves["y"]))
+        distance = float(numpy.sum(move_distances))
+        time = float(numpy.sum(move_distances / moves["speed"][1:]))
+        return f"Area: {minx:g},{miny:g}->{maxx:g},{maxy:g}\nMax depth: {-minz:g}\nDistance: {distance:g}\nTime: {time:g}\nTravel saved: {self.__travel_saved:g}"
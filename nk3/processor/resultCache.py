@@ -0,0 +1,26 @@
+from collections import OrderedDict
+from typing import Optional
+
+from nk3.processor.result import Result
+
+
+# Least recently used cache of processed job results, keyed on Job.getCacheKey()
+class ResultCache:
+    def __init__(self, max_size: int) -> None:
+        self.__max_size = max_size
+        self.__results = OrderedDict()  # type: OrderedDict[str, Result]
+
+    def get(self, key: str) -> Optional[Result]:
+        result = self.__results.get(key)
+        if result is not None:
+            self.__results.move_to_end(key)
+        return result
+
+    def put(self, key: str, result: Result) -> None:
+        self.__results[key] = result
+        self.__results.move_to_end(key)
+        while len(self.__results) > self.__max_size:
+            self.__results.popitem(last=False)
+
+    def clear(self) -> None:
+        self.__results.clear()
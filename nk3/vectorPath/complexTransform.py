@@ -2,6 +2,9 @@ import math
 
 from typing import Optional, List
 
+import numpy
+import numpy.typing
+
 
 class ComplexTransform:
     def __init__(self, matrix: Optional[List[float]]=None) -> None:
@@ -17,6 +20,16 @@ class ComplexTransform:
         m = self.__matrix
         return complex(other.real * m[0] + other.imag * m[1] + m[2], other.real * m[3] + other.imag * m[4] + m[5])
 
+    # Transform a whole array of points at once.
+    def transformArray(self, points: numpy.typing.NDArray[numpy.complex128]) -> numpy.typing.NDArray[numpy.complex128]:
+        m = self.__matrix
+        x = points.real
+        y = points.imag
+        result = numpy.empty(len(points), dtype=numpy.complex128)
+        result.real = x * m[0] + y * m[1] + m[2]
+        result.imag = x * m[3] + y * m[4] + m[5]
+        return result
+
     def combine(self, other: "ComplexTransform") -> "ComplexTransform":
         m0 = self.__matrix
         m1 = other.__matrix
@@ -34,6 +47,11 @@ class ComplexTransform:
             m0[2] * m1[6] + m0[5] * m1[7] + m0[8] * m1[8],
         ])
 
+    # The largest factor that distances get scaled with by this transform.
+    def scaleFactor(self) -> float:
+        m = self.__matrix
+        return max(math.hypot(m[0], m[3]), math.hypot(m[1], m[4]))
+
     def __repr__(self) -> str:
         return str(self.__matrix)
 
@@ -1,7 +1,12 @@
 from typing import List
 
+import numpy
+import numpy.typing
+
 
 class NURBS:
+    __MAX_SUBDIVISIONS = 16
+
     def __init__(self, degree: int) -> None:
         self._degree = degree
         self._points = []  # type: List[complex]
@@ -18,53 +23,86 @@ class NURBS:
         return len(self._points)
 
     def calculate(self, segments: int) -> List[complex]:
+        return self.calculateArray(segments).tolist()
+
+    # Evaluate the curve at evenly spaced knot values, all samples at once.
+    def calculateArray(self, segments: int) -> numpy.typing.NDArray[numpy.complex128]:
+        return self.__evaluate(numpy.linspace(self._knots[0], self._knots[-1], segments))
+
+    # Flatten the curve into points, so that the line segments between them stay within tolerance of the curve.
+    # Starts with two segments per knot span, and keeps splitting the segments of which the curve halfway
+    # is too far away from the segment.
+    def flatten(self, tolerance: float) -> numpy.typing.NDArray[numpy.complex128]:
+        u = numpy.unique(numpy.array(self._knots, dtype=numpy.float64))
+        if len(u) < 2:
+            u = numpy.array([self._knots[0], self._knots[-1]], dtype=numpy.float64)
+        u = numpy.insert(u, numpy.arange(1, len(u)), (u[:-1] + u[1:]) / 2.0)
+        points = self.__evaluate(u)
+        check = numpy.ones(len(u) - 1, dtype=bool)
+        for _ in range(self.__MAX_SUBDIVISIONS):
+            todo = numpy.flatnonzero(check)
+            if len(todo) < 1:
+                break
+            mid_u = (u[todo] + u[todo + 1]) / 2.0
+            mid_points = self.__evaluate(mid_u)
+            too_far = self.__segmentDistance(mid_points, points[todo], points[todo + 1]) > tolerance
+            split = todo[too_far]
+            u = numpy.insert(u, split + 1, mid_u[too_far])
+            points = numpy.insert(points, split + 1, mid_points[too_far])
+            # Only the two halves of each split segment need to be checked again.
+            check = numpy.zeros(len(u) - 1, dtype=bool)
+            first_half = split + numpy.arange(len(split))
+            check[first_half] = True
+            check[first_half + 1] = True
+        return points
+
+    @staticmethod
+    def __segmentDistance(p: numpy.typing.NDArray[numpy.complex128], a: numpy.typing.NDArray[numpy.complex128], b: numpy.typing.NDArray[numpy.complex128]) -> numpy.typing.NDArray[numpy.float64]:
+        d = b - a
+        length_squared = numpy.abs(d) ** 2
+        with numpy.errstate(divide="ignore", invalid="ignore"):
+            t = numpy.where(length_squared > 0.0, numpy.real((p - a) * numpy.conj(d)) / length_squared, 0.0)
+        return numpy.abs(p - (a + numpy.clip(t, 0.0, 1.0) * d))
+
+    # Per sample only the degree+1 basis functions that are non-zero in its knot span are calculated (de Boor),
+    # instead of recursing for every control point.
+    def __evaluate(self, u: numpy.typing.NDArray[numpy.float64]) -> numpy.typing.NDArray[numpy.complex128]:
         while len(self._weights) < len(self._points):
             self._weights.append(1.0)
 
-        ret = []
-        for n in range(0, segments):
-            u = self._knots[0] + (self._knots[-1] - self._knots[0]) * n / (segments - 1)
-            nku = []
-            for m in range(0, len(self._points)):
-                nku.append(self._weights[m] * self._N(m, self._degree, u))
-
-            point = complex(0, 0)
-            denom = sum(nku)
-            for m in range(0, len(self._points)):
-                if nku[m] != 0.0 and denom != 0.0:
-                    r_iku = nku[m] / denom
-                    if r_iku != 0.0:
-                        point += self._points[m] * r_iku
-
-            ret.append(point)
-        return ret
-
-    def _N(self, i: int, n: int, u: float) -> float:
-        if n == 0:
-            if self._knots[i] <= u <= self._knots[i+1]:
-                return 1
-            return 0
-        else:
-            Nin1u = self._N(i, n - 1, u)
-            Ni1n1u = self._N(i + 1, n - 1, u)
-            if Nin1u == 0.0:
-                a = 0.0
-            else:
-                a = self._F(i, n, u) * Nin1u
-            if Ni1n1u == 0.0:
-                b = 0.0
-            else:
-                b = self._G(i, n, u) * Ni1n1u
-            return a + b
-
-    def _F(self, i: int, n: int, u: float) -> float:
-        denom = self._knots[i + n] - self._knots[i]
-        if denom == 0.0:
-            return 0.0
-        return (u - self._knots[i]) / denom
-
-    def _G(self, i: int, n: int, u: float) -> float:
-        denom = self._knots[i + n + 1] - self._knots[i]
-        if denom == 0:
-            return 0.0
-        return (self._knots[i + n + 1] - u) / denom
+        degree = self._degree
+        knots = numpy.array(self._knots, dtype=numpy.float64)
+        points = numpy.array(self._points, dtype=numpy.complex128)
+        weights = numpy.array(self._weights[:len(self._points)], dtype=numpy.float64)
+
+        # Find the knot span of each sample, the last sample belongs to the last non-empty span.
+        non_empty_spans = numpy.flatnonzero(knots[:-1] < knots[1:])
+        last_span = int(non_empty_spans[-1]) if len(non_empty_spans) > 0 else 0
+        span = numpy.minimum(numpy.searchsorted(knots, u, side="right") - 1, last_span)
+
+        def knot(offset: numpy.typing.NDArray[numpy.int64]) -> numpy.typing.NDArray[numpy.float64]:
+            return knots[numpy.clip(offset, 0, len(knots) - 1)]
+
+        basis = numpy.zeros((len(u), degree + 1), dtype=numpy.float64)
+        basis[:, 0] = 1.0
+        for j in range(1, degree + 1):
+            saved = numpy.zeros(len(u), dtype=numpy.float64)
+            for r in range(j):
+                right = knot(span + r + 1) - u
+                left = u - knot(span + r + 1 - j)
+                denom = right + left
+                with numpy.errstate(divide="ignore", invalid="ignore"):
+                    temp = numpy.where(denom != 0.0, basis[:, r] / denom, 0.0)
+                basis[:, r] = saved + right * temp
+                saved = left * temp
+            basis[:, j] = saved
+
+        # Basis function r of a sample belongs to control point span - degree + r.
+        index = span[:, numpy.newaxis] - degree + numpy.arange(degree + 1)
+        valid = (index >= 0) & (index < len(points))
+        index = numpy.clip(index, 0, len(points) - 1)
+        nku = numpy.where(valid, basis * weights[index], 0.0)
+        denom = numpy.sum(nku, axis=1)
+        with numpy.errstate(divide="ignore", invalid="ignore"):
+            result = numpy.where(denom != 0.0, numpy.sum(nku * points[index], axis=1) / denom, 0.0)
+        return result.astype(numpy.complex128)
@@ -1,4 +1,4 @@
-from typing import List, Iterator
+from typing import List, Iterator, Iterable
 
 
 class VectorPath:
@@ -9,6 +9,9 @@ class VectorPath:
     def add(self, point: complex) -> None:
         self.__points.append(point)
 
+    def extend(self, points: Iterable[complex]) -> None:
+        self.__points += points
+
     def join(self, other: "VectorPath") -> None:
         if abs(self.end - other.start) < 0.001:
             self.__points += other.__points[1:]
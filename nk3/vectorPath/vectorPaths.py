@@ -1,24 +1,69 @@
 import cmath
 import math
-from typing import Optional, List, Iterator
+from typing import Optional, List, Iterator, Dict, Tuple
+
+import numpy
+import numpy.typing
 
 from nk3.vectorPath.complexTransform import ComplexTransform
 from nk3.vectorPath.nurbs import NURBS
 from nk3.vectorPath.vectorPath import VectorPath
 
 
+# Counts of what VectorPaths.stitch did, for logging.
+class StitchStatistics:
+    def __init__(self) -> None:
+        self.joins = 0
+        self.closed = 0
+        self.dropped = 0
+
+    def add(self, other: "StitchStatistics") -> None:
+        self.joins += other.joins
+        self.closed += other.closed
+        self.dropped += other.dropped
+
+    def __str__(self) -> str:
+        return f"{self.joins} joins, {self.closed} closed loops, {self.dropped} insignificant paths dropped"
+
+
 class VectorPaths:
-    __RESOLUTION = 0.5
+    # Maximum distance between a flattened curve and the real curve, in mm.
+    DEFAULT_CHORD_TOLERANCE = 0.01
+    # Maximum angle of a single segment of a flattened arc, so small circles keep their shape.
+    __MAX_SEGMENT_ANGLE = math.pi / 4
+    __MAX_CURVE_SEGMENTS = 1000
+    __TOLERANCE = 0.001
+    __CELL_SIZE = __TOLERANCE * 2
 
     def __init__(self) -> None:
         self.__paths = []  # type: List[VectorPath]
         self.__transform_stack = [ComplexTransform()]  # type: List[ComplexTransform]
+        self.__chord_tolerance = self.DEFAULT_CHORD_TOLERANCE
+        # Spatial hash of the start and end points of open paths, to quickly find the path to continue.
+        # The cells are twice the tolerance in size, so matches are always in the 2x2 cells around a point.
+        # Entries can be outdated, as paths get extended, reversed or closed, these are removed when found.
+        self.__start_index = {}  # type: Dict[Tuple[int, int], List[int]]
+        self.__end_index = {}  # type: Dict[Tuple[int, int], List[int]]
 
     def setTransformStack(self, stack: List[ComplexTransform]) -> None:
         self.__transform_stack = stack
 
+    def setChordTolerance(self, tolerance: float) -> None:
+        self.__chord_tolerance = tolerance
+
+    # Number of segments needed to follow an arc of the given angle (in radians) within the chord tolerance.
+    def __arcSegmentCount(self, radius: float, angle: float) -> int:
+        radius *= self.__transform_stack[-1].scaleFactor()
+        if radius <= 0.0:
+            return 1
+        segment_angle = 2.0 * math.acos(max(-1.0, 1.0 - self.__chord_tolerance / radius))
+        segment_angle = min(segment_angle, self.__MAX_SEGMENT_ANGLE)
+        return max(1, math.ceil(abs(angle) / segment_angle))
+
     def addLine(self, start: complex, end: complex) -> None:
-        self._findOrCreateWithEndPoint(self.__transform_stack[-1] * start).add(self.__transform_stack[-1] * end)
+        index = self.__findOrCreateIndexWithEndPoint(self.__transform_stack[-1] * start)
+        self.__paths[index].add(self.__transform_stack[-1] * end)
+        self.__indexEnd(index)
 
     def addArc(self, start: complex, end: complex, rotation: float, radius: complex, *, large_arc: bool=False, sweep: bool=False) -> None:
         if radius.real == 0.0 or radius.imag == 0.0:
@@ -70,14 +115,14 @@ class VectorPaths:
         # Compute the angle start
         n = math.sqrt((ux * ux) + (uy * uy))
         p = ux  # (1 * ux) + (0 * uy)
-        angle_start = math.degrees(math.acos(p / n))
+        angle_start = math.degrees(math.acos(max(-1.0, min(1.0, p / n))))
         if uy < 0:
             angle_start = -angle_start
 
         # Compute the angle extent
         n = math.sqrt((ux * ux + uy * uy) * (vx * vx + vy * vy))
         p = ux * vx + uy * vy
-        angle_extent = math.degrees(math.acos(p / n))
+        angle_extent = math.degrees(math.acos(max(-1.0, min(1.0, p / n))))
         if ux * vy - uy * vx < 0:
             angle_extent = -angle_extent
         if not sweep and angle_extent > 0.0:
@@ -88,23 +133,15 @@ class VectorPaths:
         self.addArcByAngle(complex(cx, cy), radius, angle_start, angle_start + angle_extent, rotation=rotation)
 
     def addArcByAngle(self, center: complex, radius: complex, start_angle: float, end_angle: float, *, rotation: float=0.0) -> None:
-        point_count = math.ceil((abs(start_angle - end_angle) / 180 * math.pi * max(radius.real, radius.imag)) / self.__RESOLUTION)
-        path = None
-        c = cmath.rect(1.0, math.radians(rotation))
-        for n in range(point_count + 1):
-            angle = math.radians(start_angle + (end_angle - start_angle) * (n / point_count))
-            p = center + complex(math.cos(angle) * radius.real, math.sin(angle) * radius.imag) * c
-            if path is None:
-                path = self._findOrCreateWithEndPoint(self.__transform_stack[-1] * p)
-            else:
-                path.add(self.__transform_stack[-1] * p)
+        point_count = self.__arcSegmentCount(max(radius.real, radius.imag), math.radians(end_angle - start_angle))
+        angles = numpy.radians(start_angle + (end_angle - start_angle) * (numpy.arange(point_count + 1) / point_count))
+        self.__addPoints(self.__ellipsePoints(center, radius, angles, rotation))
 
     def addCircle(self, center: complex, radius: float) -> None:
-        point_count = math.ceil((2.0 * math.pi * radius) / self.__RESOLUTION)
+        point_count = max(3, self.__arcSegmentCount(radius, 2.0 * math.pi))
+        angles = math.pi * 2.0 * numpy.arange(point_count) / point_count
         path = self._createPath()
-        for n in range(point_count):
-            angle = math.pi * 2.0 * n / point_count
-            path.add(self.__transform_stack[-1] * (center + complex(math.cos(angle) * radius, math.sin(angle) * radius)))
+        path.extend(self.__transform_stack[-1].transformArray(self.__ellipsePoints(center, complex(radius, radius), angles)).tolist())
         path.close()
 
     def addBulgeLine(self, start: complex, end: complex, bulge: float) -> None:
@@ -112,78 +149,163 @@ class VectorPaths:
         self.addArc(start, end, 0, complex(radius, radius), large_arc=False, sweep=bulge < 0)
 
     def addNurbs(self, nurbs: NURBS) -> None:
-        points = nurbs.calculate(nurbs.pointCount())
-        distance = 0.0
-        for p0, p1 in zip(points[0:-1], points[1:]):
-            distance += abs(self.__transform_stack[-1] * p1 - self.__transform_stack[-1] * p0)
-        if distance < 1.0:
-            point_count = int(max(2, distance / 0.1))
-        elif distance < 5.0:
-            point_count = int(max(2, distance / 0.3))
-        else:
-            point_count = int(max(2, distance / 0.5))
-        points = nurbs.calculate(point_count)
-        p = self._findOrCreateWithEndPoint(self.__transform_stack[-1] * points[0])
-        for point in points[1:]:
-            p.add(self.__transform_stack[-1] * point)
+        self.__addPoints(nurbs.flatten(self.__chord_tolerance / max(self.__transform_stack[-1].scaleFactor(), 1e-9)))
 
     def addCurve(self, start: complex, end: complex, cp0: complex, cp1: complex) -> None:
-        n = NURBS(3)
-        n.addPoint(start)
-        n.addPoint(cp0)
-        n.addPoint(cp1)
-        n.addPoint(end)
-        n.addKnot(0)
-        n.addKnot(0)
-        n.addKnot(0)
-        n.addKnot(0)
-        n.addKnot(1)
-        n.addKnot(1)
-        n.addKnot(1)
-        n.addKnot(1)
-        self.addNurbs(n)
+        self.addCurves(numpy.array([start, cp0, cp1, end], dtype=numpy.complex128))
+
+    # Add a chain of cubic bezier curves, given as start point followed by control point, control point, end point
+    # for each curve. All curves are flattened at once, each with enough evenly spaced segments to stay within
+    # the chord tolerance: the distance to the curve is at most 1/8 of the maximum second derivative divided by
+    # the squared segment count.
+    def addCurves(self, points: numpy.typing.NDArray[numpy.complex128]) -> None:
+        p0 = points[0:-1:3]
+        cp0 = points[1::3]
+        cp1 = points[2::3]
+        p1 = points[3::3]
+        max_second_derivative = 6.0 * numpy.maximum(numpy.abs(p0 - 2.0 * cp0 + cp1), numpy.abs(cp0 - 2.0 * cp1 + p1))
+        max_second_derivative *= self.__transform_stack[-1].scaleFactor()
+        segment_counts = numpy.clip(numpy.ceil(numpy.sqrt(max_second_derivative / (8.0 * self.__chord_tolerance))), 1, self.__MAX_CURVE_SEGMENTS).astype(numpy.int64)
+        # For each output point the curve it belongs to and its position on that curve, the start point is added separately.
+        curve = numpy.repeat(numpy.arange(len(segment_counts)), segment_counts)
+        t = (numpy.arange(len(curve)) - numpy.repeat(numpy.cumsum(segment_counts) - segment_counts, segment_counts) + 1.0) / segment_counts[curve]
+        u = 1.0 - t
+        result = numpy.empty(len(curve) + 1, dtype=numpy.complex128)
+        result[0] = points[0]
+        result[1:] = u * u * u * p0[curve] + 3.0 * u * u * t * cp0[curve] + 3.0 * u * t * t * cp1[curve] + t * t * t * p1[curve]
+        self.__addPoints(result)
+
+    # Add points that are already flattened, for example block geometry that is placed multiple times.
+    def addPoints(self, points: numpy.typing.NDArray[numpy.complex128], *, closed: bool=False) -> None:
+        if len(points) < 1:
+            return
+        if closed:
+            path = self._createPath()
+            path.extend(self.__transform_stack[-1].transformArray(points).tolist())
+            path.close()
+        else:
+            self.__addPoints(points)
+
+    @staticmethod
+    def __ellipsePoints(center: complex, radius: complex, angles: numpy.typing.NDArray[numpy.float64], rotation: float=0.0) -> numpy.typing.NDArray[numpy.complex128]:
+        points = numpy.empty(len(angles), dtype=numpy.complex128)
+        points.real = numpy.cos(angles) * radius.real
+        points.imag = numpy.sin(angles) * radius.imag
+        if rotation != 0.0:
+            points *= cmath.rect(1.0, math.radians(rotation))
+        return center + points
+
+    # Transform the points with the current transform in one go, and continue or start a path with them.
+    def __addPoints(self, points: numpy.typing.NDArray[numpy.complex128]) -> None:
+        transformed = self.__transform_stack[-1].transformArray(points).tolist()
+        index = self.__findOrCreateIndexWithEndPoint(transformed[0])
+        self.__paths[index].extend(transformed[1:])
+        self.__indexEnd(index)
 
     def _createPath(self, point: Optional[complex]=None) -> VectorPath:
         path = VectorPath()
         if point is not None:
             path.add(point)
         self.__paths.append(path)
+        if point is not None:
+            self.__indexStart(len(self.__paths) - 1)
+            self.__indexEnd(len(self.__paths) - 1)
         return path
 
     def _findOrCreateWithEndPoint(self, point: complex) -> VectorPath:
-        for path in self.__paths:
-            if not path.closed and abs(path.end - point) < 0.001:
-                return path
-        for path in self.__paths:
-            if not path.closed and abs(path.start - point) < 0.001:
-                path.reverse()
-                return path
-        return self._createPath(point)
+        return self.__paths[self.__findOrCreateIndexWithEndPoint(point)]
 
-    def stitch(self) -> None:
-        for path in self.__paths:
+    # Find the first open path that ends at the point, or else the first that starts at the point, which is reversed.
+    # Returns the index of the path, a new path is created if none is found.
+    def __findOrCreateIndexWithEndPoint(self, point: complex) -> int:
+        index = self.__findIndexed(self.__end_index, point, use_end=True)
+        if index is not None:
+            return index
+        index = self.__findIndexed(self.__start_index, point, use_end=False)
+        if index is not None:
+            self.__paths[index].reverse()
+            self.__indexStart(index)
+            self.__indexEnd(index)
+            return index
+        self._createPath(point)
+        return len(self.__paths) - 1
+
+    def __cellOf(self, point: complex) -> Tuple[int, int]:
+        return math.floor(point.real / self.__CELL_SIZE), math.floor(point.imag / self.__CELL_SIZE)
+
+    def __indexStart(self, index: int) -> None:
+        self.__start_index.setdefault(self.__cellOf(self.__paths[index].start), []).append(index)
+
+    def __indexEnd(self, index: int) -> None:
+        self.__end_index.setdefault(self.__cellOf(self.__paths[index].end), []).append(index)
+
+    def __rebuildIndex(self) -> None:
+        self.__start_index.clear()
+        self.__end_index.clear()
+        for index, path in enumerate(self.__paths):
             if not path.empty and not path.closed:
-                while self._stitch(path):
+                self.__indexStart(index)
+                self.__indexEnd(index)
+
+    def __findIndexed(self, cell_index: Dict[Tuple[int, int], List[int]], point: complex, *, use_end: bool, exclude: int = -1) -> Optional[int]:
+        best = None  # type: Optional[int]
+        paths = self.__paths
+        tolerance = self.__TOLERANCE
+        cell_size = self.__CELL_SIZE
+        min_x, max_x = math.floor((point.real - tolerance) / cell_size), math.floor((point.real + tolerance) / cell_size)
+        min_y, max_y = math.floor((point.imag - tolerance) / cell_size), math.floor((point.imag + tolerance) / cell_size)
+        for cell in {(min_x, min_y), (max_x, min_y), (min_x, max_y), (max_x, max_y)}:
+            entries = cell_index.get(cell)
+            if entries is None:
+                continue
+            valid = []  # type: List[int]
+            for index in entries:
+                path = paths[index]
+                if path.empty or path.closed or index in valid:
+                    continue
+                path_point = path.end if use_end else path.start
+                if (math.floor(path_point.real / cell_size), math.floor(path_point.imag / cell_size)) != cell:
+                    continue
+                valid.append(index)
+                if index != exclude and abs(path_point - point) < tolerance and (best is None or index < best):
+                    best = index
+            if not valid:
+                del cell_index[cell]
+            elif len(valid) != len(entries):
+                entries[:] = valid
+        return best
+
+    # Join open paths that connect end to end, and close paths that end where they start.
+    def stitch(self) -> "StitchStatistics":
+        statistics = StitchStatistics()
+        self.__rebuildIndex()
+        for index, path in enumerate(self.__paths):
+            if not path.empty and not path.closed:
+                while self._stitch(index, statistics):
                     pass
+        statistics.dropped = sum(1 for path in self.__paths if not path.empty and not path.isSignificant())
         self.__paths = list(filter(lambda path: not path.empty and path.isSignificant(), self.__paths))
+        self.__rebuildIndex()
+        return statistics
 
-    def _stitch(self, source: VectorPath) -> bool:
-        if abs(source.start - source.end) < 0.001:
+    def _stitch(self, source_index: int, statistics: "StitchStatistics") -> bool:
+        source = self.__paths[source_index]
+        if abs(source.start - source.end) < self.__TOLERANCE:
             source.close()
+            statistics.closed += 1
             return False
-        for target in self.__paths:
-            if target.empty or target.closed or target == source:
-                continue
-            if abs(source.end - target.start) < 0.001:
-                source.join(target)
-                return True
-            if abs(source.end - target.end) < 0.001:
-                target.reverse()
-                source.join(target)
-                return True
-        if abs(source.start - source.end) < 0.001:
-            source.close()
-        return False
+        # Pick the first path that connects to our end, preferring its start over its end when both connect.
+        start_index = self.__findIndexed(self.__start_index, source.end, use_end=False, exclude=source_index)
+        end_index = self.__findIndexed(self.__end_index, source.end, use_end=True, exclude=source_index)
+        if start_index is None and end_index is None:
+            return False
+        target = self.__paths[min(index for index in (start_index, end_index) if index is not None)]
+        if start_index is None or (end_index is not None and end_index < start_index):
+            target.reverse()
+        source.join(target)
+        statistics.joins += 1
+        self.__indexEnd(source_index)
+        return True
 
     def __iter__(self) -> Iterator[VectorPath]:
         return iter(self.__paths)
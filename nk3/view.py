@@ -69,14 +69,14 @@ class View:
         for node in self.__application.document_list:
             self._renderDocument(gl, node)
 
-        result_data = self.__application.result_data
+        moves = self.__application.result_data.moveArray
         gl.glBegin(gl.GL_LINE_STRIP)
-        for move in result_data.moves:
-            if move.z < 0.0:
+        for x, y, z in zip(moves["x"].tolist(), moves["y"].tolist(), moves["z"].tolist()):
+            if z < 0.0:
                 gl.glColor4ub(0x00, 0x00, 0x00, 0xFF)
             else:
                 gl.glColor4ub(0x80, 0x80, 0xFF, 0xFF)
-            gl.glVertex3f(move.xy.real, move.xy.imag, move.z)
+            gl.glVertex3f(x, y, z)
         gl.glEnd()
 
     def _renderFrame(self, gl: QAbstractOpenGLFunctions) -> None:
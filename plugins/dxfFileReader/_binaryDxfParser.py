@@ -0,0 +1,119 @@
+import mmap
+import struct
+from typing import List, Tuple, Optional, Callable
+
+from ._dxfParser import pausedGarbageCollection
+from .node.container import DxfContainerNode
+from .node.node import DxfNode, EntryTypes
+
+_double = struct.Struct("<d")
+_int16 = struct.Struct("<h")
+_int32 = struct.Struct("<i")
+_int64 = struct.Struct("<q")
+_bool = struct.Struct("<?")
+_code16 = struct.Struct("<H")
+
+# Value format for each range of group codes.
+# Binary chunks have a length byte followed by the data, everything not listed is a zero terminated string.
+_BINARY_CHUNK = struct.Struct("<B")
+_value_ranges = {
+    (10, 59): _double,
+    (60, 79): _int16,
+    (90, 99): _int32,
+    (110, 149): _double,
+    (160, 169): _int64,
+    (170, 179): _int16,
+    (210, 239): _double,
+    (270, 289): _int16,
+    (290, 299): _bool,
+    (310, 319): _BINARY_CHUNK,
+    (370, 389): _int16,
+    (400, 409): _int16,
+    (420, 429): _int32,
+    (440, 449): _int32,
+    (450, 459): _int32,
+    (460, 469): _double,
+    (1004, 1004): _BINARY_CHUNK,
+    (1010, 1059): _double,
+    (1060, 1070): _int16,
+    (1071, 1071): _int32,
+}
+
+# Indexed by group code, covering all possible 16 bit codes.
+_value_format = [None] * 0x10000  # type: List[Optional[struct.Struct]]
+for (first, last), value_format in _value_ranges.items():
+    for n in range(first, last + 1):
+        _value_format[n] = value_format
+
+
+# Binary DXF files contain the same group code/value pairs as text DXF files, but with binary values.
+# The values are already typed, so no text conversion is needed. The file is memory mapped and decoded in place.
+class BinaryDXFParser:
+    SENTINEL = b"AutoCAD Binary DXF\r\n\x1a\x00"
+    __PROGRESS_INTERVAL = 1024 * 1024
+
+    def __init__(self, filename: str) -> None:
+        self.__file = open(filename, "rb")
+
+    @staticmethod
+    def isBinary(filename: str) -> bool:
+        with open(filename, "rb") as f:
+            return f.read(len(BinaryDXFParser.SENTINEL)) == BinaryDXFParser.SENTINEL
+
+    # The progress callback is called with the fraction of the file that is parsed, about every megabyte.
+    def parse(self, root_entity: DxfContainerNode, progress_callback: Callable[[float], None]=lambda progress: None) -> None:
+        with self.__file, mmap.mmap(self.__file.fileno(), 0, access=mmap.ACCESS_READ) as data, pausedGarbageCollection():
+            self.__parse(data, root_entity, progress_callback)
+
+    def __parse(self, data: mmap.mmap, root_entity: DxfContainerNode, progress_callback: Callable[[float], None]) -> None:
+        current_entity = root_entity  # type: DxfNode
+        entries = []  # type: List[Tuple[int, EntryTypes]]
+        index = len(self.SENTINEL)
+        size = len(data)
+        # Since R13 group codes are 2 bytes, before that 1 byte with 255 as escape for a 2 byte code.
+        # The file always starts with group code 0, so a zero second byte tells which one is used.
+        wide_codes = size > index + 1 and data[index + 1] == 0
+        unpack_code = _code16.unpack_from
+        value_formats = _value_format
+        find = data.find
+        next_progress_report = 0
+        while index < size:
+            if wide_codes:
+                code = unpack_code(data, index)[0]
+                index += 2
+            else:
+                code = data[index]
+                index += 1
+                if code == 255:
+                    code = unpack_code(data, index)[0]
+                    index += 2
+            value_format = value_formats[code]
+            if value_format is None:
+                end = find(b"\x00", index)
+                if end < 0:
+                    end = size
+                value = data[index:end].decode("utf-8", errors="replace")  # type: EntryTypes
+                index = end + 1
+            elif value_format is _BINARY_CHUNK:
+                # Binary chunks are stored as hex strings in text DXF files, keep them the same.
+                length = data[index]
+                value = data[index + 1:index + 1 + length].hex().upper()
+                index += 1 + length
+            else:
+                value = value_format.unpack_from(data, index)[0]
+                index += value_format.size
+
+            if code == 0:
+                if index >= next_progress_report:
+                    progress_callback(index / size)
+                    next_progress_report = index + self.__PROGRESS_INTERVAL
+                if entries:
+                    current_entity.processKeys(entries)
+                    entries = []
+                current_entity = current_entity.processNewEntity(str(value))
+                if value == "EOF":
+                    break
+            else:
+                entries.append((code, value))
+        if entries:
+            current_entity.processKeys(entries)
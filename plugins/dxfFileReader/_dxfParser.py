@@ -1,31 +1,90 @@
-import logging
+import contextlib
+import gc
+import os
+from typing import Iterator, List, Tuple, Callable
 
 from .node.container import DxfContainerNode
 from .node.node import DxfNode
-from ._dxfConst import group_type
+
+
+# Parsing creates millions of entry tuples, none of which can be part of a reference cycle.
+# The garbage collector would keep on scanning all of them while they are created, so pause it.
+@contextlib.contextmanager
+def pausedGarbageCollection() -> Iterator[None]:
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if gc_enabled:
+            gc.enable()
 
 
 class DXFParser:
+    __BLOCK_SIZE = 4 * 1024 * 1024
+    # Amount of group code/value pairs between progress reports.
+    __PROGRESS_INTERVAL = 16 * 1024
+
     def __init__(self, filename: str) -> None:
-        # TODO: There is also a binary DXF format. Same concept with key-value pairs, but different format.
-        #       However, I fail to find an real-life example of this.
+        # Binary DXF files are handled by BinaryDXFParser.
         self.__file = open(filename, "rt")
 
-    def parse(self, root_entity: DxfContainerNode) -> None:
+    # The file is read in large blocks, which are split into group code/value pairs in one go.
+    # The pairs between two entity starts (group code 0) are then handed to the entity at once.
+    # Values are kept as strings here, DxfNode only converts the values that are actually used.
+    # The progress callback is called with the fraction of the file that is parsed, during each block.
+    def parse(self, root_entity: DxfContainerNode, progress_callback: Callable[[float], None]=lambda progress: None) -> None:
+        with self.__file, pausedGarbageCollection():
+            self.__parse(root_entity, progress_callback)
+
+    def __parse(self, root_entity: DxfContainerNode, progress_callback: Callable[[float], None]) -> None:
         current_entity = root_entity  # type: DxfNode
+        size = max(1, os.fstat(self.__file.fileno()).st_size)
+        block_start = 0.0
+        for code_lines, value_lines in self.__readPairs():
+            block_end = min(1.0, os.lseek(self.__file.fileno(), 0, os.SEEK_CUR) / size)
+            codes, finished = self.__parseCodes(code_lines)
+            values = [value.strip() for value in value_lines[:len(codes)]]
+            entity_starts = [index for index, code in enumerate(codes) if code == 0]
+            begin = 0
+            next_progress_report = 0
+            for end in entity_starts + [len(codes)]:
+                if end >= next_progress_report:
+                    progress_callback(block_start + (block_end - block_start) * end / max(1, len(codes)))
+                    next_progress_report = end + self.__PROGRESS_INTERVAL
+                if end > begin:
+                    current_entity.processKeys(list(zip(codes[begin:end], values[begin:end])))
+                if end < len(codes):
+                    current_entity = current_entity.processNewEntity(values[end])
+                    begin = end + 1
+            block_start = block_end
+            if finished:
+                break
+
+    # An empty group code marks the end of the data, just like the end of the file.
+    @staticmethod
+    def __parseCodes(code_lines: List[str]) -> Tuple[List[int], bool]:
+        try:
+            return list(map(int, code_lines)), False
+        except ValueError:
+            for index, code in enumerate(code_lines):
+                if code.strip() == "":
+                    return list(map(int, code_lines[:index])), True
+            raise
+
+    # Read the file in large blocks, and split those in group code lines and value lines.
+    def __readPairs(self) -> Iterator[Tuple[List[str], List[str]]]:
+        remainder = ""
         while True:
-            group_code_str = self.__file.readline().strip()
-            if group_code_str == "":
-                self.__file.close()
+            block = self.__file.read(self.__BLOCK_SIZE)
+            lines = (remainder + block).split("\n")
+            if block == "":
+                if len(lines) % 2:
+                    lines.pop()
+                yield lines[0::2], lines[1::2]
                 return
-            group_code = int(group_code_str)
-            value = self.__file.readline().strip()
-            if group_code in group_type:
-                try:
-                    value = group_type[group_code](value)
-                except ValueError:
-                    logging.warning("Failed to parse %s as %s (group code %d)", value, group_type[group_code], group_code)
-            if group_code == 0:
-                current_entity = current_entity.processNewEntity(value)
-            else:
-                current_entity.processKey(group_code, value)
+            # Keep the partial last line, and a group code line without its value, for the next block.
+            remainder = lines.pop()
+            if len(lines) % 2:
+                remainder = lines.pop() + "\n" + remainder
+            yield lines[0::2], lines[1::2]
@@ -2,7 +2,10 @@ import cmath
 import logging
 import math
 import os
-from typing import Optional, Iterable, Dict
+from typing import Optional, Iterable, Dict, Tuple, List
+
+import numpy
+import numpy.typing
 
 from nk3.depthFirstIterator import DepthFirstIterator
 from nk3.document.node import DocumentNode
@@ -10,10 +13,11 @@ from nk3.document.vectorNode import DocumentVectorNode
 from nk3.fileReader.fileReader import FileReader
 from nk3.vectorPath.complexTransform import ComplexTransform
 from nk3.vectorPath.nurbs import NURBS
-from nk3.vectorPath.vectorPaths import VectorPaths
+from nk3.vectorPath.vectorPaths import VectorPaths, StitchStatistics
 from . import _dxfConst
+from ._binaryDxfParser import BinaryDXFParser
 from ._dxfParser import DXFParser
-from .node.container import DxfContainerNode
+from .node.container import DxfContainerNode, DxfStreamingRootNode
 from .node.node import DxfNode
 
 
@@ -24,53 +28,99 @@ class DXFFileReader(FileReader):
 
     __IGNORED_ENTITIES = ("ATTDEF", "VIEWPORT", "XLINE", "POINT")
 
-    def __init__(self) -> None:
+    # In streaming mode the entities are processed while the file is parsed, and their raw entries are dropped
+    # right after, instead of first building the tree of the whole file. This needs the TABLES and BLOCKS sections
+    # to come before the ENTITIES section, as the DXF format specifies.
+    # chord_tolerance: Maximum distance between a curve and the lines it is flattened into, in drawing units.
+    def __init__(self, *, streaming: bool=True, chord_tolerance: float=VectorPaths.DEFAULT_CHORD_TOLERANCE) -> None:
         super().__init__()
+        self.__streaming = streaming
+        self.__chord_tolerance = chord_tolerance
         self.__block_by_name = {}  # type: Dict[str, DxfContainerNode]
         self.__layer_by_name = {}  # type: Dict[str, DxfNode]
+        self.__tables_collected = False
+        self.__root = DxfContainerNode(None, "ROOT", "EOF")
 
         self.__document_root = DocumentNode("PLACEHOLDER")
         self.__layers = {}  # type: Dict[str, DocumentNode]
+        self.__paths_by_layer_and_color = {}  # type: Dict[Tuple[str, Optional[int]], VectorPaths]
         self.__transform_stack = [ComplexTransform()]
 
+        # Blocks are flattened once in block coordinates, per scale level, and then placed for each INSERT.
+        # While a block is flattened, paths are recorded per layer and color instead of added to the document.
+        self.__block_geometry = {}  # type: Dict[Tuple[str, int], Dict[Tuple[str, Optional[int]], List[Tuple[numpy.typing.NDArray[numpy.complex128], bool]]]]
+        self.__recording = None  # type: Optional[Dict[Tuple[str, Optional[int]], VectorPaths]]
+        self.__flatten_scale = 1.0
+
     def load(self, filename: str) -> DocumentNode:
-        parser = DXFParser(filename)
+        parser = BinaryDXFParser(filename) if BinaryDXFParser.isBinary(filename) else DXFParser(filename)
+        # A reader can load more than one file, nothing of a previous file should be used for this one.
+        self.__block_by_name = {}
+        self.__layer_by_name = {}
+        self.__tables_collected = False
         self.__document_root = DocumentNode(os.path.basename(filename))
+        self.__layers = {}
+        self.__paths_by_layer_and_color = {}
+        self.__transform_stack = [ComplexTransform()]
+        self.__block_geometry = {}
+        self.__recording = None
+        self.__flatten_scale = 1.0
 
         # Phase 1, parse the DXF file into DxfContainerNodes and DxfNodes
         # These then contain the raw data from the DXF file, ready for next processing.
-        root = DxfContainerNode(None, "ROOT", "EOF")
-        parser.parse(root)
+        # When streaming, phase 2 and 3 already happen during parsing, for each entity as soon as it is complete.
+        if self.__streaming:
+            root = DxfStreamingRootNode(self.__processStreamedEntity)  # type: DxfContainerNode
+        else:
+            root = DxfContainerNode(None, "ROOT", "EOF")
+        self.__root = root
+        # Stitching the paths together at the end takes the last part of the progress.
+        parser.parse(root, lambda progress: self._reportProgress(progress * 0.9))
         # root.dump()
 
         # Phase 2, find layers and blocks, as we need those later on.
-        tables = root.find("SECTION", "TABLES")
-        if isinstance(tables, DxfContainerNode):
-            layers_table = tables.find("TABLE", "LAYER")
-            if isinstance(layers_table, DxfContainerNode):
-                for layer in layers_table:
-                    self.__layer_by_name[layer.name] = layer
-        blocks = root.find("SECTION", "BLOCKS")
-        if isinstance(blocks, DxfContainerNode):
-            for block in blocks:
-                assert isinstance(block, DxfContainerNode)
-                self.__block_by_name[block.name] = block
+        self.__collectTablesAndBlocks()
 
         # Phase 3, process each entity into path data.
         entities = root.find("SECTION", "ENTITIES")
         if isinstance(entities, DxfContainerNode):
+            # Hand over the last entity of a streamed file without end of section, other entities are already processed.
+            entities.handOverChildren()
             for entity in entities:
                 self._processEntity(entity)
 
-        self._finish(self.__document_root)
+        self._reportProgress(0.9)
+        statistics = StitchStatistics()
+        self._finish(self.__document_root, statistics)
+        logging.info("Stitched paths: %s", statistics)
         self.__document_root.setOrigin(0, 0)
         return self.__document_root
 
-    def _finish(self, node: DocumentNode) -> None:
+    def __processStreamedEntity(self, entity: DxfNode) -> None:
+        self.__collectTablesAndBlocks()
+        self._processEntity(entity)
+
+    def __collectTablesAndBlocks(self) -> None:
+        if self.__tables_collected:
+            return
+        self.__tables_collected = True
+        tables = self.__root.find("SECTION", "TABLES")
+        if isinstance(tables, DxfContainerNode):
+            layers_table = tables.find("TABLE", "LAYER")
+            if isinstance(layers_table, DxfContainerNode):
+                for layer in layers_table:
+                    self.__layer_by_name[layer.name] = layer
+        blocks = self.__root.find("SECTION", "BLOCKS")
+        if isinstance(blocks, DxfContainerNode):
+            for block in blocks:
+                assert isinstance(block, DxfContainerNode)
+                self.__block_by_name[block.name] = block
+
+    def _finish(self, node: DocumentNode, statistics: StitchStatistics) -> None:
         if isinstance(node, DocumentVectorNode):
-            node.getPaths().stitch()
+            statistics.add(node.getPaths().stitch())
         for child in node:
-            self._finish(child)
+            self._finish(child, statistics)
 
     def _getPathFor(self, entity: DxfNode) -> VectorPaths:
         layer_name = str(entity.findEntry(8, default="NO_LAYER"))
@@ -78,6 +128,20 @@ class DXFFileReader(FileReader):
         if color is None:
             if layer_name in self.__layer_by_name:
                 color = self._getColorFor(self.__layer_by_name[layer_name])
+        return self.__getPathForLayer(layer_name, color)
+
+    def __getPathForLayer(self, layer_name: str, color: Optional[int]) -> VectorPaths:
+        if self.__recording is not None:
+            paths = self.__recording.get((layer_name, color))
+            if paths is None:
+                paths = VectorPaths()
+                paths.setTransformStack(self.__transform_stack)
+                paths.setChordTolerance(self.__chord_tolerance / self.__flatten_scale)
+                self.__recording[(layer_name, color)] = paths
+            return paths
+        paths = self.__paths_by_layer_and_color.get((layer_name, color))
+        if paths is not None:
+            return paths
         if layer_name not in self.__layers:
             self.__layers[layer_name] = DocumentNode("LAYER:%s" % (layer_name))
             self.__document_root.append(self.__layers[layer_name])
@@ -86,14 +150,13 @@ class DXFFileReader(FileReader):
             color_name = "#%02x%02x%02x" % (color & 0xFF, (color >> 8) & 0xFF, (color >> 16) & 0xFF)
         else:
             color_name = "NoColor"
-        for child in node:
-            if child.name == color_name:
-                return child.getPaths()
         child = DocumentVectorNode(color_name)
         if color is not None:
             child.color = color
         node.append(child)
         child.getPaths().setTransformStack(self.__transform_stack)
+        child.getPaths().setChordTolerance(self.__chord_tolerance)
+        self.__paths_by_layer_and_color[(layer_name, color)] = child.getPaths()
         return child.getPaths()
 
     def _getColorFor(self, entity: DxfNode) -> Optional[int]:
@@ -221,10 +284,10 @@ class DXFFileReader(FileReader):
 
     def _processSpline(self, entity: DxfNode) -> None:
         nurbs = NURBS(entity.getInt(71))
-        for knot in entity.getEntries(40):
-            nurbs.addKnot(float(knot[0]))
-        for x, y in entity.getEntries(10, 20):
-            nurbs.addPoint(complex(float(x), float(y)))
+        for knot in entity.getFloats(40).tolist():
+            nurbs.addKnot(knot)
+        for x, y in zip(entity.getFloats(10).tolist(), entity.getFloats(20).tolist()):
+            nurbs.addPoint(complex(x, y))
         self._getPathFor(entity).addNurbs(nurbs)
 
     def _processArc(self, entity: DxfNode) -> None:
@@ -240,16 +303,49 @@ class DXFFileReader(FileReader):
         offset = entity.getComplex(10, 20)
         scale = complex(entity.getFloat(41, default=1.0), entity.getFloat(42, default=1.0))
         rotation = entity.getFloat(50)
-        column_count = entity.getInt(70, default=1)
-        row_count = entity.getInt(71, default=1)
+        column_count = max(1, entity.getInt(70, default=1))
+        row_count = max(1, entity.getInt(71, default=1))
         column_spacing = entity.getFloat(44, default=1.0)
         row_spacing = entity.getFloat(45, default=1.0)
 
-        assert column_count == 1 and row_count == 1
-        transform = ComplexTransform.rotate(rotation)\
-            .combine(ComplexTransform.scale(scale))\
-            .combine(ComplexTransform.translate(offset))
-        self.__transform_stack.append(transform.combine(self.__transform_stack[-1]))
-        for e in self.__block_by_name[entity.name]:
-            self._processEntity(e)
-        self.__transform_stack.pop()
+        if entity.name not in self.__block_by_name:
+            logging.warning("INSERT of unknown block: %s", entity.name)
+            return
+        transform = ComplexTransform.rotate(rotation).combine(ComplexTransform.scale(scale))
+        geometry = self.__getBlockGeometry(entity.name, self.__flatten_scale * transform.combine(self.__transform_stack[-1]).scaleFactor())
+        # The columns and rows of an array insert follow the rotation of the insert.
+        direction = cmath.rect(1.0, math.radians(rotation))
+        for row in range(row_count):
+            for column in range(column_count):
+                array_offset = offset + direction * complex(column * column_spacing, row * row_spacing)
+                self.__transform_stack.append(transform.combine(ComplexTransform.translate(array_offset)).combine(self.__transform_stack[-1]))
+                for (layer_name, color), paths in geometry.items():
+                    target = self.__getPathForLayer(layer_name, color)
+                    for points, closed in paths:
+                        target.addPoints(points, closed=closed)
+                self.__transform_stack.pop()
+
+    # Get the geometry of a block, flattened in block coordinates with enough detail for the given scale.
+    # Scales are rounded up to a power of two, so a block is flattened only once for similar sizes.
+    def __getBlockGeometry(self, name: str, scale: float) -> Dict[Tuple[str, Optional[int]], List[Tuple[numpy.typing.NDArray[numpy.complex128], bool]]]:
+        level = math.ceil(math.log2(max(scale, 1e-9)))
+        geometry = self.__block_geometry.get((name, level))
+        if geometry is not None:
+            return geometry
+
+        recording = {}  # type: Dict[Tuple[str, Optional[int]], VectorPaths]
+        previous_state = self.__transform_stack, self.__recording, self.__flatten_scale
+        self.__transform_stack = [ComplexTransform()]
+        self.__recording = recording
+        self.__flatten_scale = 2.0 ** level
+        try:
+            for e in self.__block_by_name[name]:
+                self._processEntity(e)
+        finally:
+            self.__transform_stack, self.__recording, self.__flatten_scale = previous_state
+
+        geometry = {}
+        for key, paths in recording.items():
+            geometry[key] = [(numpy.array(path.getPoints(), dtype=numpy.complex128), path.closed) for path in paths if not path.empty]
+        self.__block_geometry[(name, level)] = geometry
+        return geometry
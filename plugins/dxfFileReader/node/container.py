@@ -1,4 +1,4 @@
-from typing import Optional, Iterator, List
+from typing import Optional, Iterator, List, Callable
 
 from . import nodeInfo
 from .node import DxfNode
@@ -9,8 +9,27 @@ class DxfContainerNode(DxfNode):
         super().__init__(parent, name)
         self.__children = []  # type: List[DxfNode]
         self.__end_of_container_node_name = end_of_container_node_name
+        self.__child_handler = None  # type: Optional[Callable[[DxfNode], bool]]
+        self.__handed_over_count = 0
+
+    # Hand each child to the handler as soon as it is complete, children for which the handler returns True are not kept.
+    # A child is complete when the next child starts, or when this container ends.
+    def setChildHandler(self, handler: Callable[[DxfNode], bool]) -> None:
+        self.__child_handler = handler
+
+    def handOverChildren(self) -> None:
+        if self.__child_handler is None:
+            return
+        index = self.__handed_over_count
+        while index < len(self.__children):
+            if self.__child_handler(self.__children[index]):
+                del self.__children[index]
+            else:
+                index += 1
+        self.__handed_over_count = index
 
     def processNewEntity(self, name: str) -> DxfNode:
+        self.handOverChildren()
         if name == self.__end_of_container_node_name:
             result = DxfNode(self.parent, name)
             return result
@@ -34,3 +53,24 @@ class DxfContainerNode(DxfNode):
         super().dump(indent)
         for child in self.__children:
             child.dump(indent + 1)
+
+
+# Root node that hands the entities of the ENTITIES section to a handler while parsing, instead of keeping them.
+# The other sections, like TABLES and BLOCKS, are kept as usual.
+class DxfStreamingRootNode(DxfContainerNode):
+    def __init__(self, entity_handler: Callable[[DxfNode], None]) -> None:
+        super().__init__(None, "ROOT", "EOF")
+        self.__entity_handler = entity_handler
+
+    def processNewEntity(self, name: str) -> DxfNode:
+        result = super().processNewEntity(name)
+        if isinstance(result, DxfContainerNode) and result.type_name == "SECTION":
+            section = result
+            section.setChildHandler(lambda child: self.__handleSectionChild(section, child))
+        return result
+
+    def __handleSectionChild(self, section: DxfContainerNode, child: DxfNode) -> bool:
+        if section.name != "ENTITIES":
+            return False
+        self.__entity_handler(child)
+        return True
@@ -1,15 +1,33 @@
 import logging
-from typing import Optional, Union, List, Tuple
+from typing import Optional, Union, List, Tuple, Dict
+
+import numpy
+import numpy.typing
+
+from .._dxfConst import group_type
 
 EntryTypes = Union[bool, int, float, str]
 
 
+# Values are stored as they are read, and only converted to the type of their group code when they are used.
+def _typedValue(group_code: int, value: EntryTypes) -> EntryTypes:
+    if isinstance(value, str):
+        value_type = group_type.get(group_code)
+        if value_type is not None and value_type is not str:
+            try:
+                return value_type(value)
+            except ValueError:
+                logging.warning("Failed to parse %s as %s (group code %d)", value, value_type, group_code)
+    return value
+
+
 class DxfNode:
     def __init__(self, parent: Optional["DxfNode"], type_name: str) -> None:
         self.__parent = parent
         self.__type_name = type_name
         self.__name = str(id(self))
         self.__entries = []  # type: List[Tuple[int, EntryTypes]]
+        self.__index = None  # type: Optional[Dict[int, Tuple[List[int], List[EntryTypes]]]]
 
     def processNewEntity(self, name: str) -> "DxfNode":
         assert self.__parent is not None
@@ -19,6 +37,14 @@ class DxfNode:
         if group_code == 2:
             self.__name = str(value)
         self.__entries.append((group_code, value))
+        self.__index = None
+
+    def processKeys(self, entries: List[Tuple[int, EntryTypes]]) -> None:
+        for group_code, value in entries:
+            if group_code == 2:
+                self.__name = str(value)
+        self.__entries += entries
+        self.__index = None
 
     @property
     def parent(self) -> Optional["DxfNode"]:
@@ -33,42 +59,71 @@ class DxfNode:
         return self.__type_name
 
     def getInt(self, key: int, *, default: int=0) -> int:
-        for entry in self.__entries:
-            if entry[0] == key:
-                return int(entry[1])
-        return default
+        value = self.findEntry(key)
+        if value is None:
+            return default
+        return int(value)
 
     def getFloat(self, key: int, *, default: float=0.0) -> float:
-        for entry in self.__entries:
-            if entry[0] == key:
-                return float(entry[1])
-        return default
+        value = self.findEntry(key)
+        if value is None:
+            return default
+        return float(value)
 
     def getComplex(self, key_real: int, key_imag: int) -> complex:
         return complex(self.getFloat(key_real), self.getFloat(key_imag))
 
     def findEntry(self, key: int, *, default: Optional[EntryTypes]=None) -> Optional[EntryTypes]:
-        for entry in self.__entries:
-            if entry[0] == key:
-                return entry[1]
-        return default
-
+        column = self.__getIndex().get(key)
+        if column is None:
+            return default
+        return _typedValue(key, column[1][0])
+
+    # All values of a repeated group code as a float array, for example the knots of a spline.
+    def getFloats(self, key: int) -> numpy.typing.NDArray[numpy.float64]:
+        column = self.__getIndex().get(key)
+        if column is None:
+            return numpy.zeros(0, dtype=numpy.float64)
+        return numpy.array(column[1], dtype=numpy.float64)
+
+    # Group the values of the given keys, a new group starts when a key repeats within the current group.
+    # Keys missing from a group get the value 0.
     def getEntries(self, *keys: int) -> List[List[EntryTypes]]:
+        index = self.__getIndex()
+        merged = []  # type: List[Tuple[int, int, EntryTypes]]
+        for key_index, key in enumerate(keys):
+            column = index.get(key)
+            if column is not None:
+                merged += zip(column[0], [key_index] * len(column[0]), column[1])
+        merged.sort()
         current = [0] * len(keys)  # type: List[EntryTypes]
+        filled = [False] * len(keys)
         result = []  # type: List[List[EntryTypes]]
-        for entry in self.__entries:
-            if entry[0] in keys:
-                index = keys.index(entry[0])
-                if current[index] is not None:
-                    result.append(current)
-                    current = [0] * len(keys)
-                current[index] = entry[1]
-        for n in current:
-            if n is not None:
+        for _, key_index, value in merged:
+            if filled[key_index]:
                 result.append(current)
-                break
+                current = [0] * len(keys)
+                filled = [False] * len(keys)
+            current[key_index] = _typedValue(keys[key_index], value)
+            filled[key_index] = True
+        if any(filled):
+            result.append(current)
         return result
 
+    # Index of the entries by group code, with for each group code the entry positions and values.
+    # Built on the first lookup, after parsing, so lookups do not need to scan all entries.
+    def __getIndex(self) -> Dict[int, Tuple[List[int], List[EntryTypes]]]:
+        if self.__index is None:
+            self.__index = {}
+            for position, (group_code, value) in enumerate(self.__entries):
+                column = self.__index.get(group_code)
+                if column is None:
+                    self.__index[group_code] = ([position], [value])
+                else:
+                    column[0].append(position)
+                    column[1].append(value)
+        return self.__index
+
     def __getitem__(self, key: int) -> EntryTypes:
         result = self.findEntry(key)
         if result is None:
@@ -37,8 +37,9 @@ class MachineComm(OutputMethod):
         if start_code != "":
             for line in start_code.split("\n"):
                 self.__thread.queue(line)
-        for move in self.getMoves():
-            self.__thread.queue("G1 F%d X%.3f Y%.3f Z%.3f" % (move.speed, move.xy.real, move.xy.imag, move.z))
+        moves = self.getMoveArray()
+        for speed, x, y, z in zip(moves["speed"].tolist(), moves["x"].tolist(), moves["y"].tolist(), moves["z"].tolist()):
+            self.__thread.queue("G1 F%d X%.3f Y%.3f Z%.3f" % (speed, x, y, z))
         end_code = self.getSettingValue("end_code").strip()
         if end_code != "":
             for line in end_code.split("\n"):
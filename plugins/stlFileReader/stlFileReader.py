@@ -1,9 +1,27 @@
-import struct
-from typing import Iterable, List, Tuple, Dict
+import logging
+import math
+import os
+import re
+from typing import Iterable, List, Tuple, Optional
 
+import numpy
+import numpy.typing
+
+from nk3.document.imageNode import DocumentImageNode
 from nk3.document.node import DocumentNode
 from nk3.document.vectorNode import DocumentVectorNode
 from nk3.fileReader.fileReader import FileReader
+from nk3.mesh.heightmapRasterizer import rasterizeHeightmap, heightmapBounds
+from nk3.mesh.meshSlicer import sliceMesh
+from nk3.vectorPath.vectorPaths import StitchStatistics
+
+# Binary STL: an 80 byte header, a 32 bit triangle count, and then 50 bytes per triangle.
+_HEADER_SIZE = 84
+_BINARY_TRIANGLE = numpy.dtype([("normal", "<f4", (3,)), ("vertices", "<f4", (3, 3)), ("attribute", "<u2")])
+# The three coordinates of a vertex line in an ASCII STL file.
+_ASCII_VERTEX = re.compile(rb"vertex\s+(\S+)\s+(\S+)\s+(\S+)", re.IGNORECASE)
+# Maximum width and height of the heightmap in pixels.
+_MAX_HEIGHTMAP_PIXELS = 4096
 
 
 class STLFileReader(FileReader):
@@ -11,54 +29,72 @@ class STLFileReader(FileReader):
     def getExtensions() -> Iterable[str]:
         return "stl",
 
-    def __init__(self) -> None:
+    # The model is sliced every layer_height from its top down, which matches the default cut depth per pass.
+    # It is also available as a heightmap with pixels of heightmap_pixel_size, for surface operations.
+    # process_pool_size: Amount of worker processes used to slice large models, defaults to the amount of CPUs.
+    def __init__(self, *, layer_height: float = 1.0, heightmap_pixel_size: float = 0.25, process_pool_size: Optional[int] = None) -> None:
         super().__init__()
-        self.__layers: Dict[str, DocumentVectorNode] = {}
-        self.__root = DocumentVectorNode("Placeholder")
+        self.__layer_height = layer_height
+        self.__heightmap_pixel_size = heightmap_pixel_size
+        self.__process_pool_size = process_pool_size
 
+    # Each level gets a node with the contours of the material above it, and a heightmap node holds the whole model.
     def load(self, filename: str) -> DocumentNode:
-        self.__root = DocumentVectorNode(filename)
+        root = DocumentVectorNode(filename)
         triangles = self._loadSTL(filename)
-        for idx, (v0, v1, v2) in enumerate(triangles):
-            print(idx, len(triangles))
-            if v0[2] == v1[2] and v0[2] == v2[2]:
-                continue
-            if v0[2] == v1[2]:
-                self._add(v0, v1, v2)
-            elif v0[2] == v2[2]:
-                self._add(v0, v2, v1)
-            elif v1[2] == v2[2]:
-                self._add(v1, v2, v0)
+        self._reportProgress(0.1)
+        levels = []  # type: List[float]
+        if len(triangles) > 0:
+            top = float(triangles[:, :, 2].max())
+            bottom = float(triangles[:, :, 2].min())
+            layer_count = math.floor((top - bottom) / self.__layer_height + 1e-9)
+            levels = [top - self.__layer_height * n for n in range(1, layer_count + 1)]
+        slices = sliceMesh(triangles, levels, process_pool_size=self.__process_pool_size,
+                           progress_callback=lambda progress: self._reportProgress(0.1 + 0.9 * progress))
 
-        for child in self.__root:
-            child.getPaths().stitch()
-        self.__root.setOrigin(0, 0)
-        return self.__root
-
-    def _add(self, v0: Tuple[float, float, float], v1: Tuple[float, float, float], v2: Tuple[float, float, float]) -> None:
-        if v2[2] > v0[2]:
-            return
-        layer_name = f"{v0[2]:.0f} {v2[2]:.0f}"
-        layer = self.__layers.get(layer_name)
-        if layer is None:
-            layer = DocumentVectorNode(layer_name)
-            self.__layers[layer_name] = layer
-            self.__root.append(layer)
+        statistics = StitchStatistics()
+        for level, contours in zip(levels, slices):
+            if not contours:
+                continue
+            layer = DocumentVectorNode(f"Z {level:.6g}")
+            for points, closed in contours:
+                layer.getPaths().addPoints(points, closed=closed)
+            statistics.add(layer.getPaths().stitch())
+            root.append(layer)
+        logging.info("Stitched paths: %s", statistics)
 
-        layer.getPaths().addLine(complex(v0[0], v0[1]), complex(v1[0], v1[1]))
+        if len(triangles) > 0:
+            # Large models get bigger pixels, so the heightmap stays within a reasonable size.
+            model_size = float((triangles[:, :, :2].max(axis=(0, 1)) - triangles[:, :, :2].min(axis=(0, 1))).max())
+            pixel_size = max(self.__heightmap_pixel_size, model_size / _MAX_HEIGHTMAP_PIXELS)
+            # The heightmap is only rendered when a surface operation uses it.
+            origin, width, height = heightmapBounds(triangles, pixel_size)
+            root.append(DocumentImageNode("Heightmap", filename, heightmap_source=lambda: rasterizeHeightmap(triangles, pixel_size),
+                                          width=width, height=height, pixel_size=pixel_size, origin=origin))
+        root.setOrigin(0, 0)
+        return root
 
-    def _loadSTL(self, filename: str) -> List[Tuple[Tuple[float, float, float], Tuple[float, float, float], Tuple[float, float, float]]]:
-        f = open(filename, "rb")
-        header = f.read(80)
-        if header.upper().startswith(b'SOLID '):
-            f.close()
+    # Returns the triangles as an (N, 3, 3) array, with for each triangle the x, y and z of its three vertices.
+    # Binary files are memory mapped, and only the vertices are copied out.
+    def _loadSTL(self, filename: str) -> numpy.typing.NDArray[numpy.float32]:
+        size = os.path.getsize(filename)
+        with open(filename, "rb") as f:
+            header = f.read(_HEADER_SIZE)
+        count = int.from_bytes(header[80:84], "little") if len(header) == _HEADER_SIZE else -1
+        # Some binary files also start with "solid", so those are recognized by their size.
+        if header.upper().startswith(b'SOLID ') and size != _HEADER_SIZE + count * _BINARY_TRIANGLE.itemsize:
             return self._loadSTLascii(filename)
-        count = struct.unpack("<I", f.read(4))[0]
-        result = []
-        for n in range(count):
-            triangle = struct.unpack("<ffffffffffffh", f.read(50))
-            result.append(((triangle[3], triangle[4], triangle[5]), (triangle[6], triangle[7], triangle[8]), (triangle[9], triangle[10], triangle[11])))
-        return result
+        count = max(0, min(count, (size - _HEADER_SIZE) // _BINARY_TRIANGLE.itemsize))
+        if count == 0:
+            return numpy.zeros((0, 3, 3), dtype=numpy.float32)
+        data = numpy.memmap(filename, dtype=_BINARY_TRIANGLE, mode="r", offset=_HEADER_SIZE, shape=(count,))
+        return numpy.array(data["vertices"], dtype=numpy.float32)
 
-    def _loadSTLascii(self, filename: str) -> List[Tuple[Tuple[float, float, float], Tuple[float, float, float], Tuple[float, float, float]]]:
-        raise NotImplementedError()
+    # All vertex coordinates are found with a single regular expression, and converted in one go.
+    def _loadSTLascii(self, filename: str) -> numpy.typing.NDArray[numpy.float32]:
+        with open(filename, "rb") as f:
+            vertices: List[Tuple[bytes, bytes, bytes]] = _ASCII_VERTEX.findall(f.read())
+        if len(vertices) % 3 != 0:
+            logging.warning("Incomplete triangle in %s", filename)
+            del vertices[len(vertices) - len(vertices) % 3:]
+        return numpy.array(vertices, dtype=numpy.float64).astype(numpy.float32).reshape(-1, 3, 3)
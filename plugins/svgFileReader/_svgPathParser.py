@@ -0,0 +1,154 @@
+import logging
+import re
+from typing import List
+
+import numpy
+
+from nk3.vectorPath.vectorPaths import VectorPaths
+
+# A path command letter or a number, numbers can follow each other without separator, like "1.5.5" or "1-2".
+_TOKEN = re.compile("[MmZzLlHhVvCcSsQqTtAa]|[-+]?(?:[0-9]+(?:\\.[0-9]*)?|\\.[0-9]+)(?:[eE][-+]?[0-9]+)?")
+_COMMANDS = frozenset("MmZzLlHhVvCcSsQqTtAa")
+_CUBIC_COMMANDS = frozenset("CcSs")
+_QUADRATIC_COMMANDS = frozenset("QqTt")
+
+
+class _InvalidPathData(Exception):
+    pass
+
+
+# Parses the "d" attribute of a path tag in a single pass over its tokens, and adds the result to VectorPaths.
+# Runs of lines and runs of curves are collected, and added with a single call, instead of per segment.
+class SVGPathParser:
+    def __init__(self, paths: VectorPaths) -> None:
+        self.__paths = paths
+        self.__tokens = []  # type: List[str]
+        self.__index = 0
+        self.__line_points = []  # type: List[complex]
+        self.__curve_points = []  # type: List[complex]
+
+    def parse(self, path_data: str) -> None:
+        self.__tokens = _TOKEN.findall(path_data)
+        self.__index = 0
+        try:
+            self.__parse()
+        except _InvalidPathData:
+            logging.warning("Invalid path data: %s", path_data[:100])
+        self.__flush()
+
+    def __parse(self) -> None:
+        tokens = self.__tokens
+        current = complex(0, 0)
+        start = current
+        # Last control point, reflected by the smooth curve commands S and T.
+        control = current
+        command = ""
+        previous_command = ""
+        while self.__index < len(tokens):
+            if tokens[self.__index] in _COMMANDS:
+                command = tokens[self.__index]
+                self.__index += 1
+            elif command in ("", "Z", "z"):
+                raise _InvalidPathData()
+            relative = current if command.islower() else complex(0, 0)
+            upper_command = command.upper()
+
+            if upper_command == "M":
+                current = relative + self.__point()
+                start = current
+                self.__flush()
+                # Coordinates that follow a move are lines.
+                command = "l" if command == "m" else "L"
+            elif upper_command == "L":
+                end = relative + self.__point()
+                self.__lineTo(current, end)
+                current = end
+            elif upper_command == "H":
+                end = complex(relative.real + self.__number(), current.imag)
+                self.__lineTo(current, end)
+                current = end
+            elif upper_command == "V":
+                end = complex(current.real, relative.imag + self.__number())
+                self.__lineTo(current, end)
+                current = end
+            elif upper_command == "C":
+                cp0 = relative + self.__point()
+                control = relative + self.__point()
+                end = relative + self.__point()
+                self.__curveTo(current, cp0, control, end)
+                current = end
+            elif upper_command == "S":
+                cp0 = current * 2.0 - control if previous_command in _CUBIC_COMMANDS else current
+                control = relative + self.__point()
+                end = relative + self.__point()
+                self.__curveTo(current, cp0, control, end)
+                current = end
+            elif upper_command == "Q":
+                control = relative + self.__point()
+                end = relative + self.__point()
+                self.__quadraticTo(current, control, end)
+                current = end
+            elif upper_command == "T":
+                control = current * 2.0 - control if previous_command in _QUADRATIC_COMMANDS else current
+                end = relative + self.__point()
+                self.__quadraticTo(current, control, end)
+                current = end
+            elif upper_command == "A":
+                radius = complex(abs(self.__number()), abs(self.__number()))
+                rotation = self.__number()
+                large_arc = self.__flag()
+                sweep = self.__flag()
+                end = relative + self.__point()
+                self.__flush()
+                self.__paths.addArc(current, end, rotation, radius, large_arc=large_arc, sweep=not sweep)
+                current = end
+            elif upper_command == "Z":
+                if current != start:
+                    self.__lineTo(current, start)
+                current = start
+            previous_command = command
+
+    def __lineTo(self, start: complex, end: complex) -> None:
+        if not self.__line_points:
+            self.__flush()
+            self.__line_points = [start]
+        self.__line_points.append(end)
+
+    def __curveTo(self, start: complex, cp0: complex, cp1: complex, end: complex) -> None:
+        if not self.__curve_points:
+            self.__flush()
+            self.__curve_points = [start]
+        self.__curve_points += (cp0, cp1, end)
+
+    # A quadratic curve is exactly the cubic curve with its control points 2/3 of the way towards the quadratic control point.
+    def __quadraticTo(self, start: complex, control: complex, end: complex) -> None:
+        self.__curveTo(start, start + (control - start) * (2.0 / 3.0), end + (control - end) * (2.0 / 3.0), end)
+
+    def __flush(self) -> None:
+        if len(self.__line_points) > 1:
+            self.__paths.addPoints(numpy.array(self.__line_points, dtype=numpy.complex128))
+        if len(self.__curve_points) > 1:
+            self.__paths.addCurves(numpy.array(self.__curve_points, dtype=numpy.complex128))
+        self.__line_points = []
+        self.__curve_points = []
+
+    def __number(self) -> float:
+        if self.__index >= len(self.__tokens) or self.__tokens[self.__index] in _COMMANDS:
+            raise _InvalidPathData()
+        self.__index += 1
+        return float(self.__tokens[self.__index - 1])
+
+    def __point(self) -> complex:
+        x = self.__number()
+        return complex(x, self.__number())
+
+    # Arc flags are a single 0 or 1, and do not need a separator, so "a1 1 0 1150 50" contains flags 1 and 1, then x = 50.
+    def __flag(self) -> bool:
+        if self.__index >= len(self.__tokens) or self.__tokens[self.__index][0] not in "01":
+            raise _InvalidPathData()
+        token = self.__tokens[self.__index]
+        if len(token) > 1:
+            self.__tokens[self.__index] = token[1:]
+        else:
+            self.__index += 1
+        return token[0] == "1"
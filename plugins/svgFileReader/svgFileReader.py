@@ -1,14 +1,28 @@
 import logging
 import math
+import mmap
+import os
 import re
-from typing import Iterable, Optional
+from typing import Iterable, Dict, Tuple, List, Optional, Set
 from xml.etree import ElementTree
 
+import numpy
+import numpy.typing
+
 from nk3.depthFirstIterator import DepthFirstIterator
 from nk3.document.node import DocumentNode
 from nk3.document.vectorNode import DocumentVectorNode
 from nk3.fileReader.fileReader import FileReader
 from nk3.vectorPath.complexTransform import ComplexTransform
+from nk3.vectorPath.vectorPaths import VectorPaths, StitchStatistics
+from ._svgPathParser import SVGPathParser
+
+# The href (or xlink:href) attributes that reference an element in the same file, like <use href="#id">.
+_REFERENCE = re.compile(b"href\\s*=\\s*[\"']#([^\"']+)[\"']")
+
+
+class _UnresolvedReference(Exception):
+    pass
 
 
 class SVGFileReader(FileReader):
@@ -16,50 +30,192 @@ class SVGFileReader(FileReader):
     def getExtensions() -> Iterable[str]:
         return "svg",
 
-    def __init__(self) -> None:
+    # chord_tolerance: Maximum distance between a curve and the lines it is flattened into, in millimeters.
+    def __init__(self, *, chord_tolerance: float = VectorPaths.DEFAULT_CHORD_TOLERANCE) -> None:
         super().__init__()
-        self.__xml = None  # type: Optional[ElementTree.ElementTree]
+        self.__chord_tolerance = chord_tolerance
+        self.__node_by_color = {}  # type: Dict[Tuple[DocumentVectorNode, str], DocumentVectorNode]
         dpi = 90.0
         dpi = 25.4
         self.__transform_stack = [ComplexTransform.scale(complex(25.4/dpi, -25.4/dpi))]
 
+        # Elements that are referenced by <use> tags are kept in memory, and flattened once per scale level.
+        # While an element is flattened, paths are recorded per color instead of added to the document.
+        self.__referenced_ids = set()  # type: Set[str]
+        self.__definitions = {}  # type: Dict[str, ElementTree.Element]
+        self.__definition_geometry = {}  # type: Dict[Tuple[str, int], Dict[str, List[Tuple[numpy.typing.NDArray[numpy.complex128], bool]]]]
+        self.__recording = None  # type: Optional[Dict[str, DocumentVectorNode]]
+        self.__recording_ids = set()  # type: Set[str]
+        self.__flatten_scale = 1.0
+        # <use> tags that reference an element further on in the file are placed once the whole file is parsed.
+        self.__pending_uses = []  # type: List[Tuple[str, ComplexTransform, DocumentVectorNode]]
+        self.__parse_complete = False
+
+    # The file is parsed incrementally, each element is processed when it starts, and released again when it ends.
+    # So the whole document never needs to be in memory, except for the elements that are referenced by <use> tags.
     def load(self, filename: str) -> DocumentNode:
-        self.__xml = ElementTree.parse(filename)
         root_node = DocumentVectorNode(filename)
+        self.__node_by_color = {}
+        self.__referenced_ids = self.__findReferencedIds(filename)
+        self.__definitions = {}
+        self.__definition_geometry = {}
+        self.__pending_uses = []
+        self.__parse_complete = False
         root_node.getPaths().setTransformStack(self.__transform_stack)
-        self.__processGTag(self.__xml.getroot(), root_node)
+        root_node.getPaths().setChordTolerance(self.__chord_tolerance)
+        size = max(1, os.path.getsize(filename))
+        # For each open element, if it pushed a transform, if its children need to be processed, and if it is kept.
+        open_elements = []  # type: List[Tuple[ElementTree.Element, bool, bool, bool]]
+        with open(filename, "rb") as f:
+            for event, element in ElementTree.iterparse(f, events=("start", "end")):
+                if event == "start":
+                    if not open_elements:
+                        # The children of the root svg tag are processed, but not the root tag itself.
+                        open_elements.append((element, False, True, False))
+                        continue
+                    element_id = element.get("id")
+                    keep = open_elements[-1][3]
+                    if element_id is not None and element_id in self.__referenced_ids:
+                        self.__definitions[element_id] = element
+                        keep = True
+                    if not open_elements[-1][2]:
+                        open_elements.append((element, False, False, keep))
+                    else:
+                        self._reportProgress(f.tell() / size)
+                        transform = element.get("transform")
+                        if transform:
+                            self.__pushTransform(transform)
+                        open_elements.append((element, bool(transform), self.__processTag(element, root_node), keep))
+                else:
+                    _, pushed_transform, _, keep = open_elements.pop()
+                    if pushed_transform:
+                        self.__transform_stack.pop()
+                    if not keep:
+                        element.clear()
+                    if open_elements and not open_elements[-1][3]:
+                        # The element that ends is always the last child of its parent.
+                        del open_elements[-1][0][-1]
+        self.__parse_complete = True
+        for reference, transform, node in self.__pending_uses:
+            self.__placeUse(reference, transform, node)
+        self.__pending_uses = []
+        statistics = StitchStatistics()
         for node in DepthFirstIterator(root_node):
-            node.getPaths().stitch()
+            statistics.add(node.getPaths().stitch())
+        logging.info("Stitched paths: %s", statistics)
         root_node.setOrigin(0, 0)
         return root_node
 
-    def __processGTag(self, tag: ElementTree.Element, node: DocumentVectorNode) -> None:
-        for child in tag:
-            if child.get("transform"):
-                self.__pushTransform(str(child.get("transform")))
-            child_tag = child.tag[child.tag.find('}') + 1:].lower()
-            if child_tag == "g" or child_tag == "a":
-                self.__processGTag(child, node)
-            elif child_tag == "line":
-                self.__processLineTag(child, self.__getNodeFor(child, node))
-            elif child_tag == "polyline":
-                self.__processPolylineTag(child, self.__getNodeFor(child, node))
-            elif child_tag == "polygon":
-                self.__processPolygonTag(child, self.__getNodeFor(child, node))
-            elif child_tag == "circle":
-                self.__processCircleTag(child, self.__getNodeFor(child, node))
-            elif child_tag == "ellipse":
-                self.__processEllipseTag(child, self.__getNodeFor(child, node))
-            elif child_tag == "path":
-                self.__processPathTag(child, self.__getNodeFor(child, node))
-            elif child_tag == "rect":
-                self.__processRectTag(child, self.__getNodeFor(child, node))
-            elif child_tag in ("desc", "title", "animate", "animateColor", "animateTransform", "script", "namedview", "metadata"):
-                pass  # ignore these tags, as they contain no value for us.
-            else:
-                logging.warning("Unknown svg tag: %s", child_tag)
-            if child.get("transform"):
-                self.__transform_stack.pop()
+    # Find the ids that are referenced, so those elements can be kept while parsing.
+    @staticmethod
+    def __findReferencedIds(filename: str) -> Set[str]:
+        if os.path.getsize(filename) == 0:
+            return set()
+        with open(filename, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            return {reference.decode("utf-8", errors="replace") for reference in _REFERENCE.findall(data)}
+
+    @staticmethod
+    def __tagName(tag: ElementTree.Element) -> str:
+        return tag.tag[tag.tag.find('}') + 1:].lower()
+
+    # Process a single tag, returns True when it is a group of which the children need to be processed.
+    def __processTag(self, tag: ElementTree.Element, node: DocumentVectorNode) -> bool:
+        tag_name = self.__tagName(tag)
+        if tag_name == "g" or tag_name == "a":
+            return True
+        elif tag_name == "line":
+            self.__processLineTag(tag, self.__getNodeFor(tag, node))
+        elif tag_name == "polyline":
+            self.__processPolylineTag(tag, self.__getNodeFor(tag, node))
+        elif tag_name == "polygon":
+            self.__processPolygonTag(tag, self.__getNodeFor(tag, node))
+        elif tag_name == "circle":
+            self.__processCircleTag(tag, self.__getNodeFor(tag, node))
+        elif tag_name == "ellipse":
+            self.__processEllipseTag(tag, self.__getNodeFor(tag, node))
+        elif tag_name == "path":
+            self.__processPathTag(tag, self.__getNodeFor(tag, node))
+        elif tag_name == "rect":
+            self.__processRectTag(tag, self.__getNodeFor(tag, node))
+        elif tag_name == "use":
+            self.__processUseTag(tag, node)
+        elif tag_name in ("defs", "symbol"):
+            pass  # only drawn through <use> tags.
+        elif tag_name in ("desc", "title", "animate", "animateColor", "animateTransform", "script", "namedview", "metadata"):
+            pass  # ignore these tags, as they contain no value for us.
+        else:
+            logging.warning("Unknown svg tag: %s", tag_name)
+        return False
+
+    # Process a kept element together with its children, a symbol is drawn like a group here.
+    def __processElement(self, element: ElementTree.Element, node: DocumentVectorNode) -> None:
+        transform = element.get("transform")
+        if transform:
+            self.__pushTransform(transform)
+        if self.__processTag(element, node) or self.__tagName(element) == "symbol":
+            for child in element:
+                self.__processElement(child, node)
+        if transform:
+            self.__transform_stack.pop()
+
+    # Place the flattened geometry of the referenced element, moved by the x and y of the <use> tag.
+    # The viewBox of a referenced symbol is not handled, its contents are placed unscaled.
+    def __processUseTag(self, tag: ElementTree.Element, node: DocumentVectorNode) -> None:
+        reference = tag.get("href") or tag.get("{http://www.w3.org/1999/xlink}href") or ""
+        offset = complex(float(tag.get("x", 0)), float(tag.get("y", 0)))
+        transform = ComplexTransform.translate(offset).combine(self.__transform_stack[-1])
+        try:
+            self.__placeUse(reference, transform, node)
+        except _UnresolvedReference:
+            # Inside a referenced element, the <use> of that element is placed later as a whole.
+            if self.__recording is not None:
+                raise
+            self.__pending_uses.append((reference, transform, node))
+
+    # Raises _UnresolvedReference when the referenced element can still follow in the part of the file that is not parsed yet.
+    def __placeUse(self, reference: str, transform: ComplexTransform, node: DocumentVectorNode) -> None:
+        element_id = reference[1:]
+        if reference.startswith("#") and element_id not in self.__definitions and not self.__parse_complete:
+            raise _UnresolvedReference()
+        if not reference.startswith("#") or element_id not in self.__definitions:
+            logging.warning("Unknown <use> reference: %s", reference)
+            return
+        if element_id in self.__recording_ids:
+            logging.warning("Recursive <use> reference: %s", reference)
+            return
+        geometry = self.__getDefinitionGeometry(element_id, self.__flatten_scale * transform.scaleFactor(), node)
+        self.__transform_stack.append(transform)
+        for color_name, paths in geometry.items():
+            target = self.__getNodeForColor(color_name, node).getPaths()
+            for points, closed in paths:
+                target.addPoints(points, closed=closed)
+        self.__transform_stack.pop()
+
+    # Get the geometry of a referenced element, flattened in its own coordinates with enough detail for the given scale.
+    # Scales are rounded up to a power of two, so an element is flattened only once for similar sizes.
+    def __getDefinitionGeometry(self, element_id: str, scale: float, node: DocumentVectorNode) -> Dict[str, List[Tuple[numpy.typing.NDArray[numpy.complex128], bool]]]:
+        level = math.ceil(math.log2(max(scale, 1e-9)))
+        geometry = self.__definition_geometry.get((element_id, level))
+        if geometry is not None:
+            return geometry
+
+        recording = {}  # type: Dict[str, DocumentVectorNode]
+        previous_state = self.__transform_stack, self.__recording, self.__flatten_scale
+        self.__transform_stack = [ComplexTransform()]
+        self.__recording = recording
+        self.__flatten_scale = 2.0 ** level
+        self.__recording_ids.add(element_id)
+        try:
+            self.__processElement(self.__definitions[element_id], node)
+        finally:
+            self.__transform_stack, self.__recording, self.__flatten_scale = previous_state
+            self.__recording_ids.remove(element_id)
+
+        geometry = {}
+        for color_name, recorded_node in recording.items():
+            geometry[color_name] = [(numpy.array(path.getPoints(), dtype=numpy.complex128), path.closed) for path in recorded_node.getPaths() if not path.empty]
+        self.__definition_geometry[(element_id, level)] = geometry
+        return geometry
 
     def __processLineTag(self, tag: ElementTree.Element, node: DocumentVectorNode) -> None:
         x1 = float(tag.attrib.get('x1', 0))
@@ -146,141 +302,7 @@ class SVGFileReader(FileReader):
             paths.addLine(complex(x, y), complex(x+w, y))
 
     def __processPathTag(self, tag: ElementTree.Element, node: DocumentVectorNode) -> None:
-        paths = node.getPaths()
-        path_string = tag.attrib.get("d", "").replace(",", " ")
-        start = None
-        p0 = complex(0, 0)
-        cp1 = complex(0, 0)
-        for command in re.findall("[a-df-zA-DF-Z][^a-df-zA-DF-Z]*", path_string):
-            params = list(map(float, re.findall("[-\\+]?(?:[0-9]+(?:\\.[0-9]*)?|\\.[0-9]+)(?:[eE][+-]?[0-9]+)?", command[1:])))
-            command = command[0]
-            if command == "M":
-                p0 = complex(params[0], params[1])
-                if start is None:
-                    start = p0
-                for n in range(2, len(params), 2):
-                    p1 = complex(params[n], params[n + 1])
-                    paths.addLine(p0, p1)
-                    p0 = p1
-            elif command == "m":
-                p0 += complex(params[0], params[1])
-                if start is None:
-                    start = p0
-                for n in range(2, len(params), 2):
-                    p1 = p0 + complex(params[n], params[n + 1])
-                    paths.addLine(p0, p1)
-                    p0 = p1
-            elif command == "L":
-                for n in range(0, len(params), 2):
-                    p1 = complex(params[n], params[n + 1])
-                    paths.addLine(p0, p1)
-                    p0 = p1
-            elif command == "l":
-                for n in range(0, len(params), 2):
-                    if n + 1 == len(params):
-                        p1 = p0 + complex(params[n], 0)
-                    else:
-                        p1 = p0 + complex(params[n], params[n + 1])
-                    paths.addLine(p0, p1)
-                    p0 = p1
-            elif command == 'H':
-                p1 = complex(params[0], p0.imag)
-                paths.addLine(p0, p1)
-                p0 = p1
-            elif command == 'h':
-                p1 = p0 + complex(params[0], 0)
-                paths.addLine(p0, p1)
-                p0 = p1
-            elif command == 'V':
-                p1 = complex(p0.real, params[0])
-                paths.addLine(p0, p1)
-                p0 = p1
-            elif command == 'v':
-                p1 = p0 + complex(0, params[0])
-                paths.addLine(p0, p1)
-                p0 = p1
-            elif command == 'A':
-                while len(params) > 6:
-                    p1 = complex(params[5], params[6])
-                    paths.addArc(p0, p1, params[2], complex(params[0], params[1]), large_arc=params[3] > 0, sweep=params[4] <= 0)
-                    params = params[7:]
-                    p0 = p1
-            elif command == 'a':
-                while len(params) > 6:
-                    p1 = p0 + complex(params[5], params[6])
-                    paths.addArc(p0, p1, params[2], complex(params[0], params[1]), large_arc=params[3] > 0, sweep=params[4] <= 0)
-                    params = params[7:]
-                    p0 = p1
-            elif command == 'c':
-                while len(params) > 5:
-                    cp0 = p0 + complex(params[0], params[1])
-                    cp1 = p0 + complex(params[2], params[3])
-                    p1 = p0 + complex(params[4], params[5])
-                    paths.addCurve(p0, p1, cp0, cp1)
-                    p0 = p1
-                    params = params[6:]
-            elif command == 'C':
-                while len(params) > 5:
-                    cp0 = complex(params[0], params[1])
-                    cp1 = complex(params[2], params[3])
-                    p1 = complex(params[4], params[5])
-                    paths.addCurve(p0, p1, cp0, cp1)
-                    p0 = p1
-                    params = params[6:]
-            elif command == 's':
-                while len(params) > 3:
-                    cp0 = p0 - (cp1 - p0)
-                    cp1 = p0 + complex(params[0], params[1])
-                    p1 = p0 + complex(params[2], params[3])
-                    paths.addCurve(p0, p1, cp0, cp1)
-                    p0 = p1
-                    params = params[4:]
-            elif command == 'S':
-                while len(params) > 3:
-                    cp0 = p0 - (cp1 - p0)
-                    cp1 = complex(params[0], params[1])
-                    p1 = complex(params[2], params[3])
-                    paths.addCurve(p0, p1, cp0, cp1)
-                    p0 = p1
-                    params = params[4:]
-            elif command == 'q':
-                while len(params) > 3:
-                    cp0 = p0 + complex(params[0], params[1])
-                    cp1 = cp0
-                    p1 = p0 + complex(params[2], params[3])
-                    paths.addCurve(p0, p1, cp0, cp1)
-                    p0 = p1
-                    params = params[4:]
-            elif command == 'Q':
-                while len(params) > 3:
-                    cp0 = complex(params[0], params[1])
-                    cp1 = cp0
-                    p1 = complex(params[2], params[3])
-                    paths.addCurve(p0, p1, cp0, cp1)
-                    p0 = p1
-                    params = params[4:]
-            elif command == 't':
-                while len(params) > 1:
-                    cp0 = p0 - (cp1 - p0)
-                    cp1 = cp0
-                    p1 = p0 + complex(params[0], params[1])
-                    paths.addCurve(p0, p1, cp0, cp1)
-                    p0 = p1
-                    params = params[2:]
-            elif command == 'T':
-                while len(params) > 1:
-                    cp0 = p0 - (cp1 - p0)
-                    cp1 = cp0
-                    p1 = complex(params[0], params[1])
-                    paths.addCurve(p0, p1, cp0, cp1)
-                    p0 = p1
-                    params = params[2:]
-            elif command == "Z" or command == "z":
-                if p0 is not None and start is not None:
-                    paths.addLine(p0, start)
-                start = None
-            else:
-                logging.warning("Unknown path command: %s %s", command, params)
+        SVGPathParser(node.getPaths()).parse(tag.attrib.get("d", ""))
 
     def __pushTransform(self, transform: str) -> None:
         t = ComplexTransform()
@@ -310,22 +332,34 @@ class SVGFileReader(FileReader):
 
     def __getNodeFor(self, tag: ElementTree.Element, base_node: DocumentVectorNode) -> DocumentVectorNode:
         color_name = self.__getColorOf(tag)
+        if color_name.startswith("#") and len(color_name) == 4:
+            color_name = color_name[0:2] + color_name[1] + color_name[2] + color_name[2] + color_name[3] + color_name[3]
+        return self.__getNodeForColor(color_name, base_node)
+
+    def __getNodeForColor(self, color_name: str, base_node: DocumentVectorNode) -> DocumentVectorNode:
+        if self.__recording is not None:
+            child = self.__recording.get(color_name)
+            if child is None:
+                child = DocumentVectorNode(color_name)
+                child.getPaths().setTransformStack(self.__transform_stack)
+                child.getPaths().setChordTolerance(self.__chord_tolerance / self.__flatten_scale)
+                self.__recording[color_name] = child
+            return child
+
+        child = self.__node_by_color.get((base_node, color_name))
+        if child is not None:
+            return child
 
         color = None
         if color_name.startswith("#"):
-            if len(color_name) == 4:
-                color_name = color_name[0:2] + color_name[1] + color_name[2] + color_name[2] + color_name[3] + color_name[3]
             color = int(color_name[1:], 16)
-
-        for child in base_node:
-            if child.name == color_name:
-                assert isinstance(child, DocumentVectorNode)
-                return child
         child = DocumentVectorNode(color_name)
         if color is not None:
             child.color = color
         base_node.append(child)
         child.getPaths().setTransformStack(self.__transform_stack)
+        child.getPaths().setChordTolerance(self.__chord_tolerance)
+        self.__node_by_color[(base_node, color_name)] = child
         return child
 
     def __getColorOf(self, tag: ElementTree.Element) -> str:
@@ -83,6 +83,13 @@ NK3.MainWindow {
                     open_file_dialog.visible = true
                 }
             }
+            ToolButton {
+                anchors.top: parent.top
+                anchors.bottom: parent.bottom
+                visible: NK3.Application.loading
+                text: "Cancel loading (" + Math.round(NK3.Application.load_progress * 100) + "%)"
+                onClicked: NK3.Application.cancelLoad()
+            }
             ToolButton {
                 anchors.top: parent.top
                 anchors.bottom: parent.bottom
@@ -0,0 +1,94 @@
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Callable, List, Tuple
+
+# Load time of SVG files with large path data, not part of the test suite as the timings depend on the machine.
+#   python tests/benchmark_svgPathParser.py
+# Compare with another revision, for example the parser before the single-pass tokenizer:
+#   python tests/benchmark_svgPathParser.py --compare 4b84806^ --scale 0.1
+# The old parser needs minutes for the full size curve path, --scale makes all cases smaller.
+
+_REPOSITORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _svg(body: str) -> str:
+    return f'<svg xmlns="http://www.w3.org/2000/svg" width="1000mm" height="1000mm" viewBox="0 0 1000 1000">\n{body}\n</svg>\n'
+
+
+def _relativeCurves(count: int) -> str:
+    segments = " ".join("c 1,2 3,2 4,0" if n % 2 == 0 else "c 1,-2 3,-2 4,0" for n in range(count))
+    return _svg(f'<path d="m 0,500 {segments}" style="stroke:#000"/>')
+
+
+def _relativeLines(count: int) -> str:
+    segments = " ".join("l 0.01,0.3" if n % 2 == 0 else "l 0.01,-0.3" for n in range(count))
+    return _svg(f'<path d="m 0,500 {segments}" style="stroke:#000"/>')
+
+
+def _elements(count: int) -> str:
+    body = "\n".join(f'<path d="M {n % 200 * 5},{n // 200 * 5} h 3 v 3 h -3 z" style="stroke:#000"/>' for n in range(count))
+    return _svg(body)
+
+
+_CASES = [
+    ("path with {} relative c segments", 50000, _relativeCurves),
+    ("path with {} relative l segments", 200000, _relativeLines),
+    ("drawing with {} path elements", 30000, _elements),
+]  # type: List[Tuple[str, int, Callable[[int], str]]]
+
+
+# Returns the load time in seconds and the amount of points for each case.
+def _run(tree: str, directory: str, scale: float) -> List[Tuple[str, float, int]]:
+    sys.path.insert(0, tree)
+    # Import the application first, like main.py does, the machine and processor modules import each other.
+    import nk3.application  # noqa: F401
+    from nk3.depthFirstIterator import DepthFirstIterator
+    from nk3.document.vectorNode import DocumentVectorNode
+    from plugins.svgFileReader.svgFileReader import SVGFileReader
+
+    result = []  # type: List[Tuple[str, float, int]]
+    for name, count, generate in _CASES:
+        count = max(1, int(count * scale))
+        filename = os.path.join(directory, f"{generate.__name__}_{count}.svg")
+        if not os.path.exists(filename):
+            with open(filename, "w") as f:
+                f.write(generate(count))
+        start = time.perf_counter()
+        root = SVGFileReader().load(filename)
+        duration = time.perf_counter() - start
+        points = sum(len(path.getPoints()) for node in DepthFirstIterator(root) if isinstance(node, DocumentVectorNode) for path in node.getPaths())
+        result.append((name.format(count), duration, points))
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Measure the load time of SVG files with large path data.")
+    parser.add_argument("--scale", type=float, default=1.0, help="Size of the generated files, relative to the default size.")
+    parser.add_argument("--compare", metavar="REVISION", help="Also measure this git revision.")
+    parser.add_argument("--tree", default=_REPOSITORY, help=argparse.SUPPRESS)
+    parser.add_argument("--directory", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        directory = args.directory or directory
+        if args.tree != _REPOSITORY or args.compare is None:
+            for name, duration, points in _run(args.tree, directory, args.scale):
+                print(f"{name}: {duration:.2f}s, {points} points")
+            return
+
+        # Each revision runs in its own process, so the modules of both trees do not mix.
+        with tempfile.TemporaryDirectory() as tree:
+            archive = subprocess.run(["git", "-C", _REPOSITORY, "archive", args.compare], check=True, capture_output=True).stdout
+            subprocess.run(["tar", "-x", "-C", tree], input=archive, check=True)
+            for label, revision_tree in ((args.compare, tree), ("working tree", _REPOSITORY)):
+                print(f"{label}:", flush=True)
+                subprocess.run([sys.executable, os.path.abspath(__file__), "--tree", revision_tree, "--directory", directory,
+                                "--scale", str(args.scale)], check=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+import threading
+import time
+from typing import List
+
+import pytest
+
+# Import the application first, like main.py does, the machine and processor modules import each other.
+import nk3.application  # noqa: F401
+from nk3.document.node import DocumentNode
+from nk3.processor import dispatcher as dispatcher_module
+from nk3.processor.cancelToken import CancelToken
+from nk3.processor.dispatcher import Dispatcher
+from nk3.processor.result import Result
+from nk3.qt.QObjectList import QObjectList
+
+
+def _waitFor(condition: threading.Event, timeout: float = 5.0) -> bool:
+    return condition.wait(timeout)
+
+
+# A trigger that arrives while the handler is starting a run must lead to another run, and not be lost.
+def test_triggerWhileStartingRunIsProcessed(monkeypatch: pytest.MonkeyPatch) -> None:
+    dispatcher = Dispatcher(QObjectList[DocumentNode]("node"), process_pool_size=1)
+    results = []  # type: List[Result]
+    second_result = threading.Event()
+
+    def onResultData(result: Result) -> None:
+        results.append(result)
+        if len(results) >= 2:
+            second_result.set()
+    dispatcher.onResultData = onResultData
+
+    # Trigger again exactly when the handler creates the token for its run.
+    triggered_during_start = []  # type: List[bool]
+    def createToken() -> CancelToken:
+        if not triggered_during_start:
+            triggered_during_start.append(True)
+            dispatcher.trigger()
+        return CancelToken()
+    monkeypatch.setattr(dispatcher_module, "CancelToken", createToken)
+
+    dispatcher.trigger()
+    assert _waitFor(second_result)
+    assert triggered_during_start
+    time.sleep(0.1)
+    assert len(results) == 2
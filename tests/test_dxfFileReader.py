@@ -0,0 +1,81 @@
+import os
+import struct
+from typing import List, Tuple, Union
+
+import nk3.application  # noqa: F401
+from nk3.depthFirstIterator import DepthFirstIterator
+from nk3.document.vectorNode import DocumentVectorNode
+from plugins.dxfFileReader._binaryDxfParser import BinaryDXFParser
+from plugins.dxfFileReader.dxfFileReader import DXFFileReader
+
+
+# Write a binary DXF file with 2 byte group codes, values are written in the format of their group code.
+def _writeBinaryDXF(filename: str, tags: List[Tuple[int, Union[str, float, int]]]) -> None:
+    with open(filename, "wb") as f:
+        f.write(BinaryDXFParser.SENTINEL)
+        for code, value in tags:
+            f.write(struct.pack("<H", code))
+            if isinstance(value, str):
+                f.write(value.encode("utf-8") + b"\x00")
+            elif 10 <= code <= 59:
+                f.write(struct.pack("<d", value))
+            elif 450 <= code <= 459:
+                f.write(struct.pack("<i", value))
+            else:
+                raise ValueError(code)
+
+
+def _loadLines(filename: str) -> List[List[complex]]:
+    result = []  # type: List[List[complex]]
+    for node in DepthFirstIterator(DXFFileReader().load(filename)):
+        if not isinstance(node, DocumentVectorNode):
+            continue
+        for path in node.getPaths():
+            result.append([complex(round(p.real, 6), round(p.imag, 6)) for p in path.getPoints()])
+    return result
+
+
+# Group codes 450-459 are 32 bit values, the tags after them are read from the right position.
+def test_binaryLongGroupCodes(tmp_path: str) -> None:
+    filename = os.path.join(tmp_path, "test.dxf")
+    _writeBinaryDXF(filename, [
+        (0, "SECTION"), (2, "ENTITIES"),
+        (0, "LINE"), (8, "0"), (450, 1), (451, 0), (10, 1.0), (20, 2.0), (30, 0.0), (11, 5.0), (21, 7.0), (31, 0.0),
+        (0, "ENDSEC"), (0, "EOF"),
+    ])
+    # The document is moved so its bounding box starts at the origin.
+    assert _loadLines(filename) == [[complex(0, 0), complex(4, 5)]]
+
+
+def _writeDXF(filename: str, tags: List[Tuple[int, Union[str, float, int]]]) -> None:
+    with open(filename, "w") as f:
+        for code, value in tags:
+            f.write(f"{code}\n{value}\n")
+
+
+def _blockFile(line_end: float) -> List[Tuple[int, Union[str, float, int]]]:
+    return [
+        (0, "SECTION"), (2, "BLOCKS"),
+        (0, "BLOCK"), (2, "B"), (8, "0"), (10, 0.0), (20, 0.0),
+        (0, "LINE"), (8, "0"), (10, 0.0), (20, 0.0), (11, line_end), (21, 0.0),
+        (0, "ENDBLK"),
+        (0, "ENDSEC"),
+        (0, "SECTION"), (2, "ENTITIES"),
+        (0, "INSERT"), (2, "B"), (8, "0"), (10, 0.0), (20, 0.0),
+        (0, "ENDSEC"), (0, "EOF"),
+    ]
+
+
+# Loading a second file with the same reader uses the blocks of that file, not those of the first.
+def test_loadTwiceWithSameReader(tmp_path: str) -> None:
+    first = os.path.join(tmp_path, "first.dxf")
+    second = os.path.join(tmp_path, "second.dxf")
+    _writeDXF(first, _blockFile(10.0))
+    _writeDXF(second, _blockFile(20.0))
+    reader = DXFFileReader()
+    for filename, line_end in ((first, 10.0), (second, 20.0)):
+        lines = []  # type: List[List[complex]]
+        for node in DepthFirstIterator(reader.load(filename)):
+            if isinstance(node, DocumentVectorNode):
+                lines += [path.getPoints() for path in node.getPaths()]
+        assert lines == [[complex(0, 0), complex(line_end, 0)]]
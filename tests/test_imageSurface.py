@@ -0,0 +1,54 @@
+import numpy
+
+import nk3.application  # noqa: F401
+from nk3.document.imageNode import DocumentImageNode
+from nk3.document.node import DocumentNode
+from nk3.machine.machine import Machine
+from nk3.machine.operation import Operation
+from nk3.machine.tool import Tool
+from nk3.processor.collector import Collector
+from nk3.processor.processor import processJob
+from nk3.processor.processorSettings import ProcessorSettings
+from nk3.qt.QObjectList import QObjectList
+
+
+class _Machine(Machine):
+    def fillProcessorSettings(self, settings: ProcessorSettings) -> None:
+        pass
+
+
+class _Tool(Tool):
+    def fillProcessorSettings(self, settings: ProcessorSettings) -> None:
+        pass
+
+
+class _SurfaceOperation(Operation):
+    def fillProcessorSettings(self, settings: ProcessorSettings) -> None:
+        settings.surface_depth = 2.0
+        settings.surface_offset = 0.5
+
+
+# The surface toolpath of an image follows the node when it is moved, the same as what the view shows.
+def test_surfaceFollowsNodeOffset() -> None:
+    heightmap = numpy.ones((4, 6), dtype=numpy.float32)
+    node = DocumentImageNode("Heightmap", "", heightmap_source=lambda: heightmap, width=6, height=4, pixel_size=0.5, origin=complex(10, 20))
+    node.tool_index = 0
+    node.operation_index = 0
+    node.setOrigin(0.5, 0.5)
+    assert node.origin == complex(-1.5, -1)
+    assert node.getAABB() == (complex(-1.5, -1), complex(1.5, 1))
+
+    machine = _Machine()
+    tool = _Tool()
+    tool.operations.append(_SurfaceOperation())
+    machine.tools.append(tool)
+    documents = QObjectList[DocumentNode]("node")
+    documents.append(node)
+    jobs = list(Collector(documents, machine).getJobs())
+    assert len(jobs) == 1
+    assert [(origin, pixel_size) for _, origin, pixel_size in jobs[0].heightmaps] == [(complex(-1.5, -1), 0.5)]
+
+    moves = processJob(jobs[0]).moveArray
+    cut = moves[moves["z"] <= 0.0]
+    assert (float(cut["x"].min()), float(cut["y"].min())) == (-1.5, -1)
+    assert (float(cut["x"].max()), float(cut["y"].max())) == (1.0, 0.5)
@@ -0,0 +1,45 @@
+from typing import List
+
+import numpy
+
+import nk3.application  # noqa: F401
+from nk3.processor.pathOrderer import PathOrderer
+from nk3.processor.pathUtils import Path
+
+
+def _holes(count: int) -> List[Path]:
+    random = numpy.random.default_rng(3)
+    centers = random.uniform(0, 500, count) + 1j * random.uniform(0, 300, count)
+    circle = numpy.exp(1j * numpy.linspace(0, 2 * numpy.pi, 17)[:-1]) * 3.0
+    return [Path(center + circle, True) for center in centers]
+
+
+# The travel when each closed path is entered at its vertex closest to where the previous path was entered.
+def _nearestEntryTravel(paths: List[Path], start: complex) -> float:
+    travel = 0.0
+    p0 = start
+    for path in paths:
+        entry = complex(path.points[int(numpy.argmin(numpy.abs(path.points - p0)))])
+        travel += abs(entry - p0)
+        p0 = entry
+    return travel
+
+
+def test_improveIsDeterministic() -> None:
+    paths = _holes(300)
+    first = PathOrderer(paths, 0j, improve_evaluations=20000)
+    second = PathOrderer(paths, 0j, improve_evaluations=20000)
+    assert [id(path) for path in first.paths] == [id(path) for path in second.paths]
+    assert first.evaluations == second.evaluations
+    # The budget is checked before evaluating the reversals of each position, which are less than the amount of paths.
+    assert 20000 <= first.evaluations < 20000 + len(paths)
+
+
+# After 2-opt reversed parts of the order, the closed paths are entered at their nearest vertex again.
+def test_improveReseatsEntryPoints() -> None:
+    paths = _holes(300)
+    greedy = PathOrderer(paths, 0j)
+    improved = PathOrderer(paths, 0j, improve_evaluations=10 ** 8)
+    assert improved.evaluations < 10 ** 8
+    assert improved.travelDistance < greedy.travelDistance
+    assert abs(improved.travelDistance - _nearestEntryTravel(improved.paths, 0j)) < 1e-6
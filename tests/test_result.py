@@ -0,0 +1,45 @@
+from typing import List, Tuple
+
+import numpy
+import pytest
+
+from nk3.processor.result import Result
+
+
+def _moves(result: Result) -> List[Tuple[complex, float, float]]:
+    return [(move.xy, move.z, move.speed) for move in result.moves]
+
+
+def _compare(xy: numpy.typing.NDArray[numpy.complex128], z: numpy.typing.NDArray[numpy.float64], *, start: bool) -> None:
+    single = Result()
+    batch = Result()
+    for result in (single, batch):
+        result.setSpeeds(xy_speed=10.0, xy_travel_speed=20.0, z_down_speed=2.0, z_up_speed=3.0)
+        if start:
+            result.addMove(complex(0, 0), 0.0)
+    for move_xy, move_z in zip(xy.tolist(), z.tolist()):
+        single.addMove(move_xy, move_z)
+    batch.addMoves(xy, z)
+    # The kept moves are exactly the same, the vectorized speed calculation can differ in the last bit.
+    assert [(xy, z) for xy, z, speed in _moves(batch)] == [(xy, z) for xy, z, speed in _moves(single)]
+    assert [speed for xy, z, speed in _moves(batch)] == pytest.approx([speed for xy, z, speed in _moves(single)])
+
+
+# A move that is only dropped after comparing with the last kept move, also changes what the move after it is compared with.
+def test_addMovesDroppedAfterRecheck() -> None:
+    xy = numpy.array([0, 0.009, -0.005, 0.009, 1], dtype=numpy.complex128)
+    z = numpy.zeros(len(xy))
+    _compare(xy, z, start=False)
+    result = Result()
+    result.addMoves(xy, z)
+    assert [move.xy for move in result.moves] == [0, 1]
+
+
+# Moves that jitter around the 0.01mm duplicate distance give the same moves as adding them one by one.
+def test_addMovesMatchesAddMove() -> None:
+    random = numpy.random.default_rng(1)
+    for n in range(2000):
+        count = int(random.integers(1, 30))
+        xy = numpy.cumsum(random.normal(0, 0.008, count) + 1j * random.normal(0, 0.008, count))
+        z = numpy.cumsum(random.normal(0, 0.004, count)) if n % 2 else numpy.zeros(count)
+        _compare(xy, z, start=n % 3 == 0)
@@ -0,0 +1,58 @@
+import os
+from typing import Dict, List, Tuple
+
+import nk3.application  # noqa: F401
+from nk3.depthFirstIterator import DepthFirstIterator
+from plugins.svgFileReader.svgFileReader import SVGFileReader
+
+
+def _loadBounds(tmp_path: str, content: str) -> Dict[str, List[Tuple[complex, complex]]]:
+    filename = os.path.join(tmp_path, "test.svg")
+    with open(filename, "w") as f:
+        f.write(content)
+    result = {}  # type: Dict[str, List[Tuple[complex, complex]]]
+    for node in DepthFirstIterator(SVGFileReader().load(filename)):
+        for path in node.getPaths():
+            points = path.getPoints()
+            result.setdefault(node.name, []).append((
+                complex(min(p.real for p in points), min(p.imag for p in points)),
+                complex(max(p.real for p in points), max(p.imag for p in points))))
+    return result
+
+
+# A <use> before the element it references is placed the same as one after it.
+def test_useForwardReference(tmp_path: str) -> None:
+    bounds = _loadBounds(tmp_path, """<svg xmlns="http://www.w3.org/2000/svg" xmlns:xlink="http://www.w3.org/1999/xlink">
+<use href="#s" x="100" y="0"/>
+<use xlink:href="#s" x="0" y="100" transform="scale(2)"/>
+<defs><g id="s"><rect x="0" y="0" width="10" height="10" style="stroke:#f00"/></g></defs>
+<symbol id="t"><use href="#u"/></symbol>
+<use href="#t" x="300"/>
+<defs><rect id="u" x="0" y="0" width="5" height="5" style="stroke:#00f"/></defs>
+</svg>""")
+    assert sorted(bounds["#ff0000"], key=lambda b: b[0].real) == [(complex(0, 0), complex(20, 20)), (complex(100, 210), complex(110, 220))]
+    assert bounds["#0000ff"] == [(complex(300, 215), complex(305, 220))]
+
+
+def test_useUnknownReference(tmp_path: str) -> None:
+    bounds = _loadBounds(tmp_path, """<svg xmlns="http://www.w3.org/2000/svg">
+<use href="#missing"/>
+<rect x="0" y="0" width="10" height="10" style="stroke:#f00"/>
+</svg>""")
+    assert list(bounds) == ["#ff0000"]
+
+
+# Curves are flattened with the chord tolerance given to the reader, every point stays on the circle.
+def test_chordTolerance(tmp_path: str) -> None:
+    filename = os.path.join(tmp_path, "circle.svg")
+    with open(filename, "w") as f:
+        f.write("""<svg xmlns="http://www.w3.org/2000/svg"><circle cx="50" cy="50" r="50" style="stroke:#f00"/></svg>""")
+    point_counts = []  # type: List[int]
+    for tolerance in (0.01, 1.0):
+        root = SVGFileReader(chord_tolerance=tolerance).load(filename)
+        points = [point for node in DepthFirstIterator(root) for path in node.getPaths() for point in path.getPoints()]
+        # The points are evenly spread over the circle, so their average is its center.
+        center = sum(points) / len(points)
+        assert all(abs(abs(point - center) - 50.0) < 1e-6 for point in points)
+        point_counts.append(len(points))
+    assert point_counts[1] < point_counts[0] / 5